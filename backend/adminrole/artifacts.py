@@ -0,0 +1,106 @@
+# adminrole/artifacts.py
+# Rendered exports kept on disk under EXPORTS_ROOT and reused until their inputs change
+import hashlib
+import json
+import os
+import tempfile
+import time
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from .versions import bump_version, get_version
+
+# Not under MEDIA_ROOT: the names are computable, so the files must only go out through the views
+ARTIFACT_DIR = 'cache'
+# Writes that bypass the version signals are picked up once an artifact is this old
+MAX_AGE = 30 * 60
+
+STUDENTS_VERSION = 'student_exports'
+ALLOTMENT_VERSION = 'allotment_exports'
+
+
+def digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode()).hexdigest()[:20]
+
+
+class Artifact:
+    """
+    One export file for (endpoint, params) at the current versions of its
+    inputs. The file lives at EXPORTS_ROOT/cache/<endpoint>/<params digest>/<etag>.<ext>,
+    so a version bump gives a new name. `mtime` is set when a fresh copy is
+    already stored.
+    """
+
+    def __init__(self, endpoint, params, versions, extension):
+        self.directory = os.path.join(settings.EXPORTS_ROOT, ARTIFACT_DIR, endpoint, digest(params))
+        self.tag = digest([endpoint, params, {name: get_version(name) for name in versions}])
+        self.path = os.path.join(self.directory, f"{self.tag}.{extension}")
+        self.mtime = self.modified()
+
+    @property
+    def etag(self):
+        return f'"{self.tag}"'
+
+    def modified(self):
+        """mtime of the stored file, or None if there is no fresh one."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return None
+        return mtime if time.time() - mtime < MAX_AGE else None
+
+    def store(self, render):
+        """Call render(stream) into a temp file and move it into place atomically."""
+        os.makedirs(self.directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix='.tmp', delete=False) as stream:
+            try:
+                render(stream)
+            except BaseException:
+                stream.close()
+                os.unlink(stream.name)
+                raise
+        os.replace(stream.name, self.path)
+        self.mtime = os.path.getmtime(self.path)
+
+        # Files of outdated versions are never served again; leave a margin so
+        # nothing still being read is removed
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if time.time() - os.path.getmtime(path) > 2 * MAX_AGE:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+    def response(self, request, render, filename, content_type):
+        """
+        Serve the artifact, rendering it first if there is no fresh copy.
+        Conditional GETs that match the ETag or Last-Modified get a 304
+        without the file being opened.
+        """
+        if self.mtime is not None and request.method in ('GET', 'HEAD'):
+            not_modified = get_conditional_response(request, etag=self.etag, last_modified=int(self.mtime))
+            if not_modified is not None:
+                not_modified['ETag'] = self.etag
+                not_modified['Last-Modified'] = http_date(self.mtime)
+                return not_modified
+        if self.mtime is None:
+            self.store(render)
+
+        response = FileResponse(
+            open(self.path, 'rb'), as_attachment=True, filename=filename, content_type=content_type
+        )
+        response['ETag'] = self.etag
+        response['Last-Modified'] = http_date(self.mtime)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+def invalidate_artifacts(*names):
+    """Bump the given export versions once the current transaction commits."""
+    def bump():
+        for name in names:
+            bump_version(name)
+    transaction.on_commit(bump)
@@ -0,0 +1,205 @@
+# adminrole/bench/allotment.py
+"""
+Allotment benchmark: generates synthetic cohorts of increasing size in a
+throwaway test database and measures the allotment path on each.
+
+    python -m adminrole.bench.allotment
+    python -m adminrole.bench.allotment --sizes 100 1000 --compare bench/allotment-old.json
+
+Writes wall time, query count, peak traced memory and rows written per size
+and strategy to a JSON file that can be diffed between commits.
+
+The test database is created straight from the current models with
+migrations disabled: the migration chain does not apply to an empty
+database (authentication 0019 creates the Branch and Caste tables a second
+time), and the benchmark only needs the final schema.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext, override_settings  # noqa: E402
+from allotment.engine import run_allotment  # noqa: E402
+from allotment.models import Room, WaitlistEntry  # noqa: E402
+from allotment.strategies import DEFAULT_STRATEGY, STRATEGIES  # noqa: E402
+from allotment.synthetic import generate_hostel  # noqa: E402
+
+DEFAULT_SIZES = [100, 1000, 5000, 20000]
+BRANCHES = 5
+CLASS_NAME, GENDER = 'fy', 'male'
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_cohort(size, capacity, preferences, room_ratio, seed):
+    """One (fy, male) cohort of about `size` students with rooms for room_ratio of its groups."""
+    per_branch = max(1, size // BRANCHES)
+    groups = -(-per_branch * BRANCHES // capacity)
+    floors = 4
+    rooms_per_floor = max(1, int(groups * room_ratio) // floors)
+    return generate_hostel(
+        years=[CLASS_NAME],
+        genders=[GENDER],
+        blocks=1,
+        floors=floors,
+        rooms=rooms_per_floor,
+        capacity=capacity,
+        branches=BRANCHES,
+        students_per_branch=per_branch,
+        preferences=preferences,
+        prefix='bench',
+        seed=seed,
+    )
+
+
+class DisableMigrations(dict):
+    """MIGRATION_MODULES value that turns migrations off for every app, so migrate syncs the models."""
+
+    def __contains__(self, app_label):
+        return True
+
+    def __getitem__(self, app_label):
+        return None
+
+
+def reset_allotment():
+    Room.objects.update(is_occupied=False, alloted_group=None)
+    WaitlistEntry.objects.all().delete()
+
+
+def measure(strategy, seed, repeat):
+    """Time `repeat` allotments from an empty hostel, then one more under tracemalloc."""
+    timings = []
+    for _ in range(repeat):
+        reset_allotment()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            result = run_allotment(CLASS_NAME, GENDER, seed=seed, strategy=strategy)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    reset_allotment()
+    tracemalloc.start()
+    try:
+        run_allotment(CLASS_NAME, GENDER, seed=seed, strategy=strategy)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_ms': round(statistics.median(timings), 2),
+        'wall_ms_min': round(min(timings), 2),
+        'phases_ms': result['timings'],
+        'queries': len(queries),
+        'peak_kib': round(peak / 1024, 1),
+        'rows_written': result['rooms_written'] + len(result['waitlist']),
+        'placed': len(result['allocated_rooms']),
+        'unplaced': len(result['unplaced_groups']),
+    }
+
+
+def compare(previous, current):
+    """Print wall time and memory ratios against an earlier result file."""
+    before = {(row['size'], row['strategy']): row for row in previous['results']}
+    print(f"\nCompared with {previous['meta'].get('revision') or 'previous run'}:")
+    for row in current['results']:
+        old = before.get((row['size'], row['strategy']))
+        if old is None:
+            continue
+        wall = row['wall_ms'] / old['wall_ms'] if old['wall_ms'] else float('nan')
+        peak = row['peak_kib'] / old['peak_kib'] if old['peak_kib'] else float('nan')
+        flag = '  <-- slower' if wall > 1.2 else ''
+        print(
+            f"  {row['size']:>6} {row['strategy']:<20} wall x{wall:.2f}  peak x{peak:.2f}  "
+            f"queries {old['queries']} -> {row['queries']}{flag}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Students per cohort")
+    parser.add_argument('--strategies', nargs='+', choices=list(STRATEGIES), default=[DEFAULT_STRATEGY])
+    parser.add_argument('--capacity', type=int, default=3, help="Students per room and group")
+    parser.add_argument('--preferences', type=int, default=20, help="Rooms ranked per group")
+    parser.add_argument('--room-ratio', type=float, default=0.9, help="Rooms per group; below 1 leaves a waitlist")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per size, the median is reported")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=None, help="Result file (default: allotment-bench-<revision>.json)")
+    parser.add_argument('--compare', help="Earlier result file to compare against")
+    args = parser.parse_args(argv)
+
+    revision = git_revision()
+    # Never benchmark against the configured database: work in a disposable test copy
+    with override_settings(MIGRATION_MODULES=DisableMigrations()):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    results = []
+    try:
+        for size in args.sizes:
+            call_command('flush', interactive=False, verbosity=0)
+            stats = build_cohort(size, args.capacity, args.preferences, args.room_ratio, args.seed)
+            for strategy in args.strategies:
+                row = {
+                    'size': size,
+                    'strategy': strategy,
+                    'students': stats['students'],
+                    'groups': stats['groups'],
+                    'rooms': stats['rooms'],
+                    'preferences': stats['preferences'],
+                    'generate_seconds': stats['elapsed_seconds'],
+                    **measure(strategy, args.seed, args.repeat),
+                }
+                results.append(row)
+                print(
+                    f"{size:>6} students {strategy:<20} {row['wall_ms']:>10.1f} ms "
+                    f"{row['queries']:>4} queries {row['peak_kib']:>10.1f} KiB peak "
+                    f"{row['rows_written']:>6} rows"
+                )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    report = {
+        'meta': {
+            'revision': revision,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    output = args.output or f"allotment-bench-{revision or 'local'}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# adminrole/counters.py
+from django.db import transaction
+from django.db.models import Count, F
+from authentication.models import StudentDataEntry
+from .models import RegistrationCounter
+
+STATUSES = [status for status, _ in RegistrationCounter.STATUS_CHOICES]
+# StudentDataEntry fields that decide which counter a student is in
+KEY_FIELDS = ('class_name', 'gender', 'verified')
+
+
+def student_status(verified):
+    if verified is None:
+        return "pending"
+    return "verified" if verified else "rejected"
+
+
+def counter_key(student):
+    """(class_name, gender, status) counter a StudentDataEntry belongs to."""
+    return student.class_name, student.gender, student_status(student.verified)
+
+
+def stored_counter_key(pk):
+    """
+    Counter key of the saved StudentDataEntry row `pk`, or None if there is
+    none. Inside a transaction the row stays locked until it ends, so the key
+    cannot change before the counters are adjusted.
+    """
+    rows = StudentDataEntry.objects.filter(pk=pk)
+    if transaction.get_connection().in_atomic_block:
+        rows = rows.select_for_update()
+    row = rows.values_list(*KEY_FIELDS).first()
+    if row is None:
+        return None
+    class_name, gender, verified = row
+    return class_name, gender, student_status(verified)
+
+
+def adjust_counter(key, delta):
+    """Add delta to one counter row, creating it on first use; safe under concurrent writers."""
+    class_name, gender, status = key
+    counter = RegistrationCounter.objects.filter(class_name=class_name, gender=gender, status=status)
+    if not counter.update(count=F('count') + delta):
+        RegistrationCounter.objects.bulk_create(
+            [RegistrationCounter(class_name=class_name, gender=gender, status=status)],
+            ignore_conflicts=True,
+        )
+        counter.update(count=F('count') + delta)
+
+
+def registration_counts(**filters):
+    """{(class_name, gender): {"pending": n, "verified": n, "rejected": n}} from the counters table."""
+    counts = {}
+    for class_name, gender, status, count in RegistrationCounter.objects.filter(**filters).values_list(
+        'class_name', 'gender', 'status', 'count'
+    ):
+        counts.setdefault((class_name, gender), dict.fromkeys(STATUSES, 0))[status] = count
+    return counts
+
+
+def actual_counts():
+    """The same counts recomputed with COUNT(*) over StudentDataEntry."""
+    counts = {}
+    for row in StudentDataEntry.objects.values('class_name', 'gender', 'verified').annotate(
+        total=Count('roll_no')
+    ).order_by():
+        key = (row['class_name'], row['gender'])
+        counts.setdefault(key, dict.fromkeys(STATUSES, 0))[student_status(row['verified'])] += row['total']
+    return counts
+
+
+def reconcile_counters(dry_run=False):
+    """
+    Rebuild the counters table from StudentDataEntry. Returns the drift that
+    was found as [(class_name, gender, status, stored, actual)].
+    """
+    with transaction.atomic():
+        # Lock the counters so signal updates wait for the rebuild
+        stored = {
+            (counter.class_name, counter.gender, counter.status): counter.count
+            for counter in RegistrationCounter.objects.select_for_update()
+        }
+        actual = {
+            (class_name, gender, status): count
+            for (class_name, gender), statuses in actual_counts().items()
+            for status, count in statuses.items()
+            if count
+        }
+        drift = [
+            (*key, stored.get(key, 0), actual.get(key, 0))
+            for key in sorted(set(stored) | set(actual))
+            if stored.get(key, 0) != actual.get(key, 0)
+        ]
+        if drift and not dry_run:
+            RegistrationCounter.objects.all().delete()
+            RegistrationCounter.objects.bulk_create([
+                RegistrationCounter(class_name=class_name, gender=gender, status=status, count=count)
+                for (class_name, gender, status), count in actual.items()
+            ])
+    return drift
@@ -0,0 +1,109 @@
+# adminrole/dashboard.py
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from allotment.models import Room
+from .counters import registration_counts
+from .versions import bump_version, versioned_key
+
+CACHE_NAME = 'dashboard'
+# Writes that bypass signals (raw UPDATEs, shell edits) are picked up after this long
+CACHE_TIMEOUT = 5 * 60
+
+YEARS = [
+    ("fy", "first-year", "First Year"),
+    ("sy", "second-year", "Second Year"),
+    ("ty", "third-year", "Third Year"),
+    ("btech", "final-year", "Final Year"),
+]
+GENDERS = ["male", "female"]
+
+
+def cohort_status(registrations, verified, pending):
+    if registrations > 0 and verified == 0:
+        return "registration"
+    if verified > 0 and pending > 0:
+        return "verification"
+    if verified > 0 and pending == 0 and verified < registrations:
+        return "selection"
+    return "completed"
+
+
+def dashboard_payload():
+    """
+    Manager dashboard data from two queries: student counts per (class_name,
+    gender) from the registration counters, and room occupancy grouped the
+    same way using conditional aggregation.
+    """
+    students = {
+        key: {
+            'registrations': sum(statuses.values()),
+            'verified': statuses['verified'],
+            'pending': statuses['pending'],
+        }
+        for key, statuses in registration_counts().items()
+    }
+    rooms = {
+        (row['floor__class_name'], row['floor__gender']): row
+        for row in Room.objects.values('floor__class_name', 'floor__gender').annotate(
+            rooms=Count('id'),
+            capacity=Sum('floor__block__per_room_capacity'),
+            occupied=Count('id', filter=Q(is_occupied=True)),
+            vacant_seats=Sum('floor__block__per_room_capacity', filter=Q(is_occupied=False)),
+        ).order_by()
+    }
+
+    year_data = {}
+    overall_stats = {
+        "totalSeats": 0,
+        "totalRegistrations": sum(row['registrations'] for row in students.values()),
+        "totalVerified": sum(row['verified'] for row in students.values()),
+        "totalPendingVerifications": sum(row['pending'] for row in students.values()),
+        "vacantRooms": 0,
+        "vacantSeats": 0,
+    }
+    for class_name, year_key, year_name in YEARS:
+        year_data[year_key] = {"name": year_name}
+        for gender in GENDERS:
+            counts = students.get((class_name, gender), {})
+            registrations = counts.get('registrations', 0)
+            verified = counts.get('verified', 0)
+            pending = counts.get('pending', 0)
+
+            occupancy = rooms.get((class_name, gender), {})
+            room_count = occupancy.get('rooms', 0)
+            capacity = occupancy.get('capacity') or 0
+            total_seats = room_count * (capacity // room_count) if room_count and capacity else 0
+            vacant_rooms = room_count - occupancy.get('occupied', 0)
+            vacant_seats = occupancy.get('vacant_seats') or 0
+
+            year_data[year_key][gender] = {
+                "totalSeats": total_seats,
+                "registrations": registrations,
+                "verified": verified,
+                "pendingVerifications": pending,
+                "status": cohort_status(registrations, verified, pending),
+                "vacantRooms": vacant_rooms,
+                "occupiedRooms": occupancy.get('occupied', 0),
+                "vacantSeats": vacant_seats,
+            }
+            overall_stats["totalSeats"] += total_seats
+            overall_stats["vacantRooms"] += vacant_rooms
+            overall_stats["vacantSeats"] += vacant_seats
+
+    return {"yearData": year_data, "overallStats": overall_stats}
+
+
+def cached_dashboard():
+    """dashboard_payload() for the current data version; a cache read between writes."""
+    key = versioned_key(CACHE_NAME)
+    payload = cache.get(key)
+    if payload is None:
+        payload = dashboard_payload()
+        cache.set(key, payload, CACHE_TIMEOUT)
+    return payload
+
+
+def invalidate_dashboard():
+    """Bump the dashboard version once the current transaction commits."""
+    transaction.on_commit(lambda: bump_version(CACHE_NAME))
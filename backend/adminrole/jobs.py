@@ -0,0 +1,247 @@
+# adminrole/jobs.py
+import logging
+import os
+import secrets
+import shutil
+import threading
+import time
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# kind -> handler(job, **params); handlers are registered in adminrole/tasks.py
+JOB_HANDLERS = {}
+
+# A running job whose worker has not reported for this long is picked up again
+STALE_AFTER = timedelta(minutes=10)
+# How often a worker touches heartbeat_at while a handler runs; well under STALE_AFTER
+HEARTBEAT_SECONDS = 60
+RETRY_BACKOFF_SECONDS = 30
+# Files produced by jobs are deleted this long after they were written
+JOB_FILE_RETENTION = timedelta(days=7)
+
+
+class JobError(Exception):
+    """A failure that retrying will not fix (bad input, nothing to process)."""
+
+
+def register_job(kind):
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, params=None, user=None, max_attempts=3):
+    """Queue a job for the worker and return it."""
+    return Job.objects.create(
+        kind=kind,
+        params=params or {},
+        created_by=user if user is not None and user.is_authenticated else None,
+        max_attempts=max_attempts,
+    )
+
+
+def report_progress(job, progress, message=''):
+    """Record progress (0 - 100) from inside a handler; also serves as the worker heartbeat."""
+    job.progress = max(0, min(100, int(progress)))
+    job.message = message[:255]
+    Job.objects.filter(pk=job.pk).update(
+        progress=job.progress, message=job.message, heartbeat_at=timezone.now()
+    )
+
+
+class Heartbeat(threading.Thread):
+    """
+    Touches job.heartbeat_at every HEARTBEAT_SECONDS while a handler runs, so
+    a long step that reports no progress is not taken for a dead worker.
+    """
+
+    def __init__(self, job):
+        super().__init__(name=f"job-{job.pk}-heartbeat", daemon=True)
+        self.job_id = job.pk
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(HEARTBEAT_SECONDS):
+                Job.objects.filter(pk=self.job_id, status="running").update(heartbeat_at=timezone.now())
+        except Exception:
+            logger.exception(f"Heartbeat for job {self.job_id} stopped")
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def claim_next_job(worker):
+    """Atomically take the oldest runnable job, or return None."""
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status="queued", run_after__lte=now)
+            .order_by('run_after', 'id')
+            .first()
+        )
+        if job is None:
+            # Jobs left running by a worker that died: fail the ones that have
+            # used up their attempts, retry the rest
+            stale = Job.objects.filter(status="running", heartbeat_at__lt=now - STALE_AFTER)
+            stale.filter(attempts__gte=F('max_attempts')).update(
+                status="failed",
+                message="The worker stopped responding",
+                error=f"No heartbeat for {STALE_AFTER.total_seconds() // 60:.0f} minutes on the last attempt",
+                finished_at=now,
+            )
+            job = (
+                stale.select_for_update(skip_locked=True)
+                .filter(attempts__lt=F('max_attempts'))
+                .order_by('heartbeat_at', 'id')
+                .first()
+            )
+        if job is None:
+            return None
+        job.status = "running"
+        job.attempts += 1
+        job.worker = worker
+        job.started_at = now
+        job.heartbeat_at = now
+        job.save(update_fields=['status', 'attempts', 'worker', 'started_at', 'heartbeat_at'])
+    return job
+
+
+def run_job(job):
+    """Run a claimed job, recording its result or scheduling a retry."""
+    handler = JOB_HANDLERS.get(job.kind)
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job kind '{job.kind}'")
+        try:
+            result = handler(job, **job.params)
+        finally:
+            heartbeat.stop()
+    except Exception as e:
+        logger.exception(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}")
+        job.error = f"{e}\n{traceback.format_exc()}"
+        job.finished_at = timezone.now()
+        if handler is not None and not isinstance(e, JobError) and job.attempts < job.max_attempts:
+            job.status = "queued"
+            job.run_after = job.finished_at + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+            job.message = f"Retrying after error: {e}"[:255]
+        else:
+            job.status = "failed"
+            job.message = str(e)[:255]
+        job.save(update_fields=['status', 'error', 'message', 'run_after', 'finished_at'])
+        return job
+
+    job.status = "succeeded"
+    job.progress = 100
+    job.result = result
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'progress', 'result', 'finished_at'])
+    return job
+
+
+def job_output(job, filename):
+    """
+    Path for a file produced by `job`, and the token that names its directory.
+    Files go under EXPORTS_ROOT, never MEDIA_ROOT, and are downloaded through
+    JobFileView by the admin who queued the job.
+    """
+    token = secrets.token_urlsafe(24)
+    path = os.path.join(settings.EXPORTS_ROOT, 'jobs', token, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path, token
+
+
+def job_file(job, token):
+    """Path of the file `job` produced if `token` is its download token, else None."""
+    result = job.result if isinstance(job.result, dict) else {}
+    if job.status != "succeeded" or not result.get('token') or not result.get('filename'):
+        return None
+    if not secrets.compare_digest(str(token), result['token']):
+        return None
+    path = os.path.join(settings.EXPORTS_ROOT, 'jobs', result['token'], os.path.basename(result['filename']))
+    return path if os.path.isfile(path) else None
+
+
+def delete_old_job_files(max_age=JOB_FILE_RETENTION):
+    """Delete job output directories older than max_age. Returns how many were removed."""
+    root = os.path.join(settings.EXPORTS_ROOT, 'jobs')
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return 0
+    cutoff = time.time() - max_age.total_seconds()
+    removed = 0
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path)
+                removed += 1
+        except OSError:
+            logger.exception(f"Could not delete job files in {entry.path}")
+    if removed:
+        logger.info(f"Deleted {removed} job output directories older than {max_age}")
+    return removed
+
+
+def job_payload(job, request=None):
+    result = job.result
+    if isinstance(result, dict) and 'token' in result:
+        # The token only goes out as part of the download URL
+        result = {key: value for key, value in result.items() if key != 'token'}
+        if request is not None:
+            result['file_url'] = request.build_absolute_uri(
+                reverse('job-file', args=[job.id, job.result['token']])
+            )
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "result": result,
+        "error": job.error.splitlines()[0] if job.error else None,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def is_true(value):
+    return str(value).lower() in ('true', '1', 'yes')
+
+
+def is_background(request):
+    """Whether the caller asked for the work to run on the job worker."""
+    value = request.data.get('background') if request.method == 'POST' else None
+    if value is None:
+        value = request.query_params.get('background')
+    return is_true(value)
+
+
+def job_accepted(request, job):
+    return Response(
+        {
+            "message": "Job queued",
+            "job_id": job.id,
+            "status_url": request.build_absolute_uri(reverse('job-status', args=[job.id])),
+        },
+        status=status.HTTP_202_ACCEPTED
+    )
@@ -0,0 +1,42 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from adminrole.merit_import import MeritImportError, import_merit
+
+
+class Command(BaseCommand):
+    help = "Import rank, CGPA and backlogs by roll number from a merit-list CSV or XLSX"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Merit list (.csv or .xlsx) with a roll_no column")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and report without writing")
+        parser.add_argument('--report', help="Write the full JSON report, including every row error, to this file")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f"No such file: {path}")
+
+        with open(path, 'rb') as f:
+            try:
+                report = import_merit(f, path, dry_run=options['dry_run'])
+            except MeritImportError as e:
+                raise CommandError(str(e))
+
+        for error in report['errors'][:20]:
+            self.stderr.write(f"row {error['row']} ({error['roll_no']}): {error['error']}")
+        if len(report['errors']) > 20:
+            self.stderr.write(f"... and {len(report['errors']) - 20} more errors")
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            "{prefix}{rows} rows, {matched} students matched, {updated_entries} entries and "
+            "{updated_verifications} verifications updated, {reranked_partitions} partitions re-ranked "
+            "({reranked_students} students moved), {errors} errors in {elapsed_seconds}s".format(
+                prefix="[dry run] " if report['dry_run'] else "",
+                errors=len(report['errors']),
+                **{key: value for key, value in report.items() if key != 'errors'},
+            )
+        ))
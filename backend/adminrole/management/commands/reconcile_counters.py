@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from adminrole.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild the registration counters from StudentDataEntry and report any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report drift, do not fix it")
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters(dry_run=options['check'])
+        for class_name, gender, status, stored, actual in drift:
+            self.stdout.write(f"{class_name} {gender} {status}: counter {stored}, actual {actual}")
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Counters match StudentDataEntry"))
+        elif options['check']:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} counters drifted; run without --check to fix"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(drift)} counters"))
@@ -0,0 +1,31 @@
+import os
+import socket
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from adminrole import tasks  # noqa: F401  (registers the job handlers)
+from adminrole.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (allotment, ranking, exports)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+        parser.add_argument('--poll', type=float, default=2.0, help="Seconds to wait when the queue is empty")
+
+    def handle(self, *args, **options):
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(f"Job worker {worker} started")
+        while True:
+            close_old_connections()
+            job = claim_next_job(worker)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+                continue
+
+            self.stdout.write(f"Running {job}")
+            job = run_job(job)
+            self.stdout.write(f"Finished {job}")
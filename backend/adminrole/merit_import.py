@@ -0,0 +1,233 @@
+# adminrole/merit_import.py
+import csv
+import io
+import logging
+import time
+import openpyxl
+from django.db import transaction
+from authentication.models import StudentDataEntry, StudentDataVerification
+from allotment.ranking import mark_partitions_dirty, rerank_dirty_partitions
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FIELDS = ('rank', 'cgpa', 'backlogs')
+CHUNK_SIZE = 1000
+
+# Spreadsheet header -> field, after lower-casing and turning spaces/dashes into underscores
+HEADER_ALIASES = {
+    'roll_no': 'roll_no',
+    'rollno': 'roll_no',
+    'roll_number': 'roll_no',
+    'rank': 'rank',
+    'merit_rank': 'rank',
+    'cet_rank': 'rank',
+    'jee_rank': 'rank',
+    'cgpa': 'cgpa',
+    'backlogs': 'backlogs',
+    'backlog': 'backlogs',
+}
+
+
+class MeritImportError(Exception):
+    """The file as a whole cannot be imported (unreadable, or no usable columns)."""
+
+
+def normalize_header(value):
+    key = str(value or '').strip().lower().replace(' ', '_').replace('-', '_').replace('.', '')
+    return HEADER_ALIASES.get(key)
+
+
+def read_csv_rows(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    except UnicodeDecodeError:
+        raise MeritImportError("CSV file is not UTF-8 encoded")
+    finally:
+        # Hand the underlying file back to its owner open
+        text.detach()
+
+
+def read_xlsx_rows(file):
+    # read_only streams rows from the sheet XML instead of loading every cell
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_merit_rows(file, filename):
+    """
+    Yield (row number, {field: raw value}) for each data row of a merit list.
+    The first row is the header; unknown columns are ignored.
+    """
+    if filename.lower().endswith('.csv'):
+        rows = read_csv_rows(file)
+    elif filename.lower().endswith(('.xlsx', '.xlsm')):
+        rows = read_xlsx_rows(file)
+    else:
+        raise MeritImportError("Unsupported file type, upload a .csv or .xlsx file")
+
+    try:
+        header = next(rows, None)
+    except MeritImportError:
+        raise
+    except Exception as e:
+        raise MeritImportError(f"Could not read {filename}: {e}")
+    columns = [normalize_header(value) for value in header or ()]
+    if 'roll_no' not in columns:
+        raise MeritImportError("Missing a roll_no column")
+    if not set(IMPORT_FIELDS) & set(columns):
+        raise MeritImportError(f"Need at least one of these columns: {', '.join(IMPORT_FIELDS)}")
+
+    for row_number, row in enumerate(rows, start=2):
+        values = {
+            field: value for field, value in zip(columns, row)
+            if field is not None and value not in (None, '')
+        }
+        if values:
+            yield row_number, values
+
+
+def parse_int(value, field, minimum):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    try:
+        number = int(str(value).strip())
+    except ValueError:
+        raise ValueError(f"{field} must be a whole number, got {value!r}")
+    if number < minimum:
+        raise ValueError(f"{field} must be at least {minimum}")
+    return number
+
+
+def parse_merit_row(values):
+    """Validate one row. Returns (roll_no, {field: value}) or raises ValueError."""
+    roll_no = str(values.get('roll_no', '')).strip()
+    if not roll_no:
+        raise ValueError("roll_no is empty")
+    if len(roll_no) > 20:
+        raise ValueError("roll_no is longer than 20 characters")
+
+    updates = {}
+    if 'rank' in values:
+        updates['rank'] = parse_int(values['rank'], 'rank', 1)
+    if 'backlogs' in values:
+        updates['backlogs'] = parse_int(values['backlogs'], 'backlogs', 0)
+    if 'cgpa' in values:
+        try:
+            cgpa = float(str(values['cgpa']).strip())
+        except ValueError:
+            raise ValueError(f"cgpa must be a number, got {values['cgpa']!r}")
+        if not 0 <= cgpa <= 10:
+            raise ValueError("cgpa must be between 0 and 10")
+        updates['cgpa'] = cgpa
+    if not updates:
+        raise ValueError(f"Row has none of {', '.join(IMPORT_FIELDS)}")
+    return roll_no, updates
+
+
+def apply_merit_chunk(chunk, report, partitions, dry_run):
+    """
+    Bulk update the students of one validated chunk [(row number, roll_no,
+    updates)], writing only rows whose values differ. Partitions whose rank
+    or CGPA changed are added to `partitions`.
+    """
+    roll_nos = [roll_no for _, roll_no, _ in chunk]
+    entries = StudentDataEntry.objects.only(
+        'roll_no', 'class_name', 'branch_id', 'gender', *IMPORT_FIELDS
+    ).in_bulk(roll_nos)
+    verifications = StudentDataVerification.objects.only('roll_no', *IMPORT_FIELDS).in_bulk(roll_nos)
+
+    changed_entries, changed_verifications = [], []
+    entry_fields, verification_fields = set(), set()
+    for row_number, roll_no, updates in chunk:
+        entry = entries.get(roll_no)
+        verification = verifications.get(roll_no)
+        if entry is None and verification is None:
+            report['errors'].append({"row": row_number, "roll_no": roll_no, "error": "Unknown roll number"})
+            continue
+
+        for record, changed, fields in (
+            (entry, changed_entries, entry_fields),
+            (verification, changed_verifications, verification_fields),
+        ):
+            if record is None:
+                continue
+            moved = [field for field, value in updates.items() if getattr(record, field) != value]
+            if not moved:
+                continue
+            for field in moved:
+                setattr(record, field, updates[field])
+            fields.update(moved)
+            changed.append(record)
+            if record is entry and {'rank', 'cgpa'} & set(moved):
+                partitions.add((entry.class_name, entry.branch_id, entry.gender))
+        report['matched'] += 1
+
+    if not dry_run:
+        # Signals are bypassed here; affected partitions are re-ranked once at the end
+        if changed_entries:
+            StudentDataEntry.objects.bulk_update(changed_entries, sorted(entry_fields))
+        if changed_verifications:
+            StudentDataVerification.objects.bulk_update(changed_verifications, sorted(verification_fields))
+    report['updated_entries'] += len(changed_entries)
+    report['updated_verifications'] += len(changed_verifications)
+
+
+def import_merit(file, filename, dry_run=False):
+    """
+    Apply rank/cgpa/backlogs from a merit-list CSV or XLSX to StudentDataEntry
+    and StudentDataVerification by roll_no. Rows are streamed and validated
+    CHUNK_SIZE at a time; bad rows are reported and skipped, the rest are
+    written with bulk updates in one transaction. Only partitions whose rank
+    or CGPA changed are re-ranked afterwards. Raises MeritImportError if the
+    file cannot be read at all.
+    """
+    started = time.perf_counter()
+    report = {
+        "rows": 0,
+        "matched": 0,
+        "updated_entries": 0,
+        "updated_verifications": 0,
+        "reranked_partitions": 0,
+        "reranked_students": 0,
+        "dry_run": dry_run,
+        "errors": [],
+    }
+    partitions = set()
+    seen = set()
+
+    with transaction.atomic():
+        chunk = []
+        for row_number, values in read_merit_rows(file, filename):
+            report['rows'] += 1
+            try:
+                roll_no, updates = parse_merit_row(values)
+            except ValueError as e:
+                report['errors'].append({"row": row_number, "roll_no": values.get('roll_no'), "error": str(e)})
+                continue
+            if roll_no in seen:
+                report['errors'].append({"row": row_number, "roll_no": roll_no, "error": "Duplicate roll number"})
+                continue
+            seen.add(roll_no)
+            chunk.append((row_number, roll_no, updates))
+            if len(chunk) >= CHUNK_SIZE:
+                apply_merit_chunk(chunk, report, partitions, dry_run)
+                chunk = []
+        if chunk:
+            apply_merit_chunk(chunk, report, partitions, dry_run)
+        if partitions and not dry_run:
+            mark_partitions_dirty(partitions)
+
+    if partitions and not dry_run:
+        report['reranked_students'] = rerank_dirty_partitions()
+    report['reranked_partitions'] = len(partitions)
+    report['errors'].sort(key=lambda error: error['row'])
+    report['elapsed_seconds'] = round(time.perf_counter() - started, 2)
+    logger.info(
+        f"Merit import: {report['rows']} rows, {report['updated_entries']} entries and "
+        f"{report['updated_verifications']} verifications updated, {len(report['errors'])} errors"
+    )
+    return report
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:47
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_counters(apps, schema_editor):
+    StudentDataEntry = apps.get_model('authentication', 'StudentDataEntry')
+    RegistrationCounter = apps.get_model('adminrole', 'RegistrationCounter')
+    statuses = {None: 'pending', True: 'verified', False: 'rejected'}
+    RegistrationCounter.objects.bulk_create([
+        RegistrationCounter(
+            class_name=row['class_name'],
+            gender=row['gender'],
+            status=statuses[row['verified']],
+            count=row['total'],
+        )
+        for row in StudentDataEntry.objects.values('class_name', 'gender', 'verified').annotate(
+            total=Count('roll_no')
+        ).order_by()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminrole', '0010_job'),
+        ('authentication', '0027_studentdataverification_backlogs_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistrationCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('class_name', models.CharField(max_length=10)),
+                ('gender', models.CharField(max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('verified', 'Verified'), ('rejected', 'Rejected')], max_length=10)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('class_name', 'gender', 'status')},
+            },
+        ),
+        migrations.RunPython(build_counters, migrations.RunPython.noop),
+    ]
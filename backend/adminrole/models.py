@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class SelectDates(models.Model):
     EVENT_CHOICES = (
@@ -64,3 +65,62 @@ class AllotmentHistory(models.Model):
 
     def __str__(self):
         return f"Allotment for {self.year} - {self.gender}"
+
+class Job(models.Model):
+    STATUS_CHOICES = (
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    )
+
+    kind = models.CharField(max_length=50)  # e.g., 'allot_rooms'
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    progress = models.PositiveSmallIntegerField(default=0)  # 0 - 100
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    created_by = models.ForeignKey('authentication.CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_after = models.DateTimeField(default=timezone.now)  # Delays retries
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+class RegistrationCounter(models.Model):
+    """Materialized StudentDataEntry count per (class_name, gender, status); see adminrole.counters."""
+    STATUS_CHOICES = (
+        ("pending", "Pending"),      # verified is None
+        ("verified", "Verified"),    # verified is True
+        ("rejected", "Rejected"),    # verified is False
+    )
+
+    class_name = models.CharField(max_length=10)
+    gender = models.CharField(max_length=10)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('class_name', 'gender', 'status')
+
+    def __str__(self):
+        return f"{self.class_name} {self.gender} {self.status}: {self.count}"
+
+class CacheVersion(models.Model):
+    """Version number of a family of cached values; see adminrole.versions."""
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
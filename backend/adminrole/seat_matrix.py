@@ -0,0 +1,321 @@
+# adminrole/seat_matrix.py
+import logging
+from array import array
+from fractions import Fraction
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from authentication.models import Branch, Caste
+from allotment.models import Room
+from .models import SeatMatrix
+from .versions import bump_version, versioned_key
+
+logger = logging.getLogger(__name__)
+
+OPEN_KEY = "Open"  # General seats of a branch, open to every student and filled first
+MERGED_KEY = "common"  # {group name: [castes]} for castes sharing one quota
+CACHE_NAME = 'seat_matrix'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class SeatMatrixError(ValueError):
+    """branch_seats is malformed and cannot be compiled."""
+
+
+class CompiledSeatMatrix:
+    """
+    Validated quota table of one (year, gender) seat matrix.
+
+    `branches` and `categories` give every branch and reserved category a
+    dense index. `open_seats[b]` is the Open quota of branch b and
+    `quotas[b * len(categories) + c]` the quota of category c in branch b.
+    A category is an upper-cased caste or a merged group of castes;
+    `members[b]` maps each caste to the category serving it in branch b.
+    `warnings` lists anything that compiled but looks wrong.
+    """
+
+    def __init__(self, year, gender, branches, categories, open_seats, quotas, members, warnings=()):
+        self.year = year
+        self.gender = gender
+        self.branches = branches
+        self.branch_index = {name: index for index, name in enumerate(branches)}
+        self.categories = categories
+        self.category_index = {name: index for index, name in enumerate(categories)}
+        self.open_seats = open_seats
+        self.quotas = quotas
+        self.members = members
+        self.warnings = list(warnings)
+        self.total_seats = self.ews_seats = self.all_india_seats = 0
+        self.goi_jk_seats = self.nri_seats = 0
+        self.branch_weights = [0.0] * len(branches)
+        self.caste_percentages = {}
+
+    def quota(self, branch, category):
+        return self.quotas[branch * len(self.categories) + category]
+
+    def category_of(self, branch, caste):
+        """Category index serving `caste` in branch index `branch`, or None."""
+        return self.members[branch].get((caste or '').upper())
+
+    def branch_total(self, branch):
+        width = len(self.categories)
+        return self.open_seats[branch] + sum(self.quotas[branch * width:(branch + 1) * width])
+
+    def seats(self):
+        return sum(self.open_seats) + sum(self.quotas)
+
+    def branch_quotas(self, branch):
+        """{category: seats} of branch index `branch`, Open first, zero quotas left out."""
+        quotas = {OPEN_KEY: self.open_seats[branch]} if self.open_seats[branch] else {}
+        for category, name in enumerate(self.categories):
+            if self.quota(branch, category):
+                quotas[name] = self.quota(branch, category)
+        return quotas
+
+    def as_dict(self):
+        return {
+            "year": self.year,
+            "gender": self.gender,
+            "total_seats": self.total_seats,
+            "compiled_seats": self.seats(),
+            "ews_seats": self.ews_seats,
+            "all_india_seats": self.all_india_seats,
+            "goi_jk_seats": self.goi_jk_seats,
+            "nri_fn_pio_gulf_seats": self.nri_seats,
+            "categories": self.categories,
+            "branches": [
+                {
+                    "branch": name,
+                    "weight": self.branch_weights[index],
+                    "seats": self.branch_total(index),
+                    "quotas": self.branch_quotas(index),
+                }
+                for index, name in enumerate(self.branches)
+            ],
+            "warnings": self.warnings,
+        }
+
+
+def seat_count(value, where):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+        raise SeatMatrixError(f"{where}: seat count must be a whole number, got {value!r}")
+    if value < 0:
+        raise SeatMatrixError(f"{where}: seat count cannot be negative")
+    return int(value)
+
+
+def compile_branch_seats(branch_seats, year=None, gender=None):
+    """
+    Compile the branch_seats JSON ({branch: {category: seats, "common":
+    {group: [castes]}}}) into a CompiledSeatMatrix. Raises SeatMatrixError
+    for anything selection could not use.
+    """
+    if not isinstance(branch_seats, dict):
+        raise SeatMatrixError("branch_seats must be an object keyed by branch")
+
+    branches, categories, category_index = [], [], {}
+    open_seats, rows, members, warnings = array('l'), [], [], []
+    for branch_name, branch_info in branch_seats.items():
+        if not isinstance(branch_info, dict):
+            raise SeatMatrixError(f"{branch_name}: expected an object of category seat counts")
+
+        groups = branch_info.get(MERGED_KEY) or {}
+        if not isinstance(groups, dict) or not all(
+            isinstance(castes, list) and all(isinstance(caste, str) for caste in castes)
+            for castes in groups.values()
+        ):
+            raise SeatMatrixError(f"{branch_name}: '{MERGED_KEY}' must map group names to lists of castes")
+        group_names = {group.upper(): group for group in groups}
+
+        row, branch_members = {}, {}
+        branch_open = 0
+        for key, value in branch_info.items():
+            if key == MERGED_KEY:
+                continue
+            seats = seat_count(value, f"{branch_name}/{key}")
+            if key == OPEN_KEY:
+                branch_open += seats
+                continue
+            category = key.upper()
+            if category not in category_index:
+                category_index[category] = len(categories)
+                categories.append(category)
+            index = category_index[category]
+            # Keys differing only in case share one quota
+            row[index] = row.get(index, 0) + seats
+
+            castes = groups[group_names[category]] if category in group_names else [key]
+            for caste in castes:
+                caste = caste.upper()
+                if branch_members.get(caste, index) != index:
+                    raise SeatMatrixError(f"{branch_name}: caste {caste} is in more than one category")
+                branch_members[caste] = index
+
+        for group in groups:
+            if group.upper() not in category_index or category_index[group.upper()] not in row:
+                warnings.append(f"{branch_name}: merged group {group} has no seat count")
+
+        branches.append(branch_name)
+        open_seats.append(branch_open)
+        rows.append(row)
+        members.append(branch_members)
+
+    quotas = array('l', [0]) * (len(branches) * len(categories))
+    for branch, row in enumerate(rows):
+        for category, seats in row.items():
+            quotas[branch * len(categories) + category] = seats
+    return CompiledSeatMatrix(year, gender, branches, categories, open_seats, quotas, members, warnings)
+
+
+def compile_seat_matrix(seat_matrix, branches=(), castes=()):
+    """
+    Compile a SeatMatrix (saved or not) with its ReservedSeat, checked against
+    the year's (branch, seat_allocation_weight) and (caste,
+    seat_matrix_percentage) rows.
+    """
+    compiled = compile_branch_seats(seat_matrix.branch_seats, seat_matrix.year, seat_matrix.gender)
+    compiled.total_seats = seat_matrix.total_seats or 0
+    compiled.ews_seats = seat_matrix.ews_seats or 0
+    compiled.all_india_seats = seat_matrix.all_india_seats or 0
+    reserved = seat_matrix.reserved_seats if seat_matrix.reserved_seats_id else None
+    if reserved is not None:
+        compiled.goi_jk_seats = reserved.goi_jk_seats
+        compiled.nri_seats = reserved.nri_fn_pio_gulf_seats
+
+    weights = {name: float(weight or 0) for name, weight in branches}
+    compiled.branch_weights = [weights.get(name, 0.0) for name in compiled.branches]
+    compiled.caste_percentages = {name.upper(): float(percentage or 0) for name, percentage in castes}
+
+    if branches:
+        for name in compiled.branches:
+            if name not in weights:
+                compiled.warnings.append(f"Unknown branch {name} for {seat_matrix.year}")
+    if castes:
+        known = set(compiled.caste_percentages)
+        for branch, name in enumerate(compiled.branches):
+            unknown = sorted(set(compiled.members[branch]) - known)
+            if unknown:
+                compiled.warnings.append(f"{name}: unknown castes {', '.join(unknown)}")
+    if compiled.total_seats and compiled.seats() != compiled.total_seats:
+        compiled.warnings.append(
+            f"Branch quotas add up to {compiled.seats()} seats, total_seats is {compiled.total_seats}"
+        )
+    return compiled
+
+
+def seat_matrix_inputs(year):
+    """(branch, weight) and (caste, percentage) rows of one year, in id order."""
+    branches = list(Branch.objects.filter(year=year).order_by('id').values_list('branch', 'seat_allocation_weight'))
+    castes = list(Caste.objects.filter(year=year).order_by('id').values_list('caste', 'seat_matrix_percentage'))
+    return branches, castes
+
+
+def load_seat_matrix(year, gender):
+    """
+    The compiled seat matrix of one cohort, from the cache when its inputs
+    have not changed since it was compiled. Raises SeatMatrix.DoesNotExist.
+    """
+    key = versioned_key(CACHE_NAME, year, gender)
+    compiled = cache.get(key)
+    if compiled is None:
+        seat_matrix = SeatMatrix.objects.select_related('reserved_seats').get(year=year, gender=gender)
+        compiled = compile_seat_matrix(seat_matrix, *seat_matrix_inputs(year))
+        cache.set(key, compiled, CACHE_TIMEOUT)
+        for warning in compiled.warnings:
+            logger.warning(f"Seat matrix {year}/{gender}: {warning}")
+    return compiled
+
+
+def invalidate_seat_matrices():
+    """
+    Drop every compiled seat matrix once the current transaction commits;
+    called when any of their input rows change.
+    """
+    transaction.on_commit(lambda: bump_version(CACHE_NAME))
+
+
+def largest_remainder(total, weights):
+    """
+    Split `total` seats in proportion to `weights` (Hamilton's method): every
+    share gets the floor of its exact quota, and the seats left over go to the
+    largest fractional remainders, ties to the larger weight then the earlier
+    entry. Exact rational arithmetic, so the result never depends on float
+    rounding. Zero total weight gives every share 0.
+    """
+    weights = [Fraction(weight or 0) for weight in weights]
+    weight_sum = sum(weights)
+    if total <= 0 or weight_sum <= 0:
+        return [0] * len(weights)
+
+    exact = [total * weight / weight_sum for weight in weights]
+    shares = [quota.numerator // quota.denominator for quota in exact]
+    leftover = total - sum(shares)
+    order = sorted(range(len(weights)), key=lambda i: (-(exact[i] - shares[i]), -weights[i], i))
+    for i in order[:leftover]:
+        shares[i] += 1
+    return shares
+
+
+def hostel_capacity(year, gender):
+    """Beds of one cohort: per_room_capacity summed over the rooms on its floors."""
+    return Room.objects.filter(floor__class_name=year, floor__gender=gender).aggregate(
+        seats=Sum('floor__block__per_room_capacity')
+    )['seats'] or 0
+
+
+def generate_branch_seats(total, branches, castes, merges=None):
+    """
+    branch_seats for `total` seats: apportioned across branches by
+    seat_allocation_weight, then within each branch across castes by
+    seat_matrix_percentage, both by largest remainder. `merges` ({branch:
+    {group: [castes]}}) keeps merged caste groups as one summed quota.
+    Raises SeatMatrixError when the weights or percentages are all zero.
+    """
+    if not branches or not any(weight for _, weight in branches):
+        raise SeatMatrixError("Set a seat_allocation_weight for at least one branch")
+    if not castes or not any(percentage for _, percentage in castes):
+        raise SeatMatrixError("Set a seat_matrix_percentage for at least one caste")
+
+    caste_names = [name for name, _ in castes]
+    percentages = [percentage for _, percentage in castes]
+    branch_seats = {}
+    for (branch, _), seats in zip(branches, largest_remainder(total, [weight for _, weight in branches])):
+        quotas = dict(zip(caste_names, largest_remainder(seats, percentages)))
+        groups = (merges or {}).get(branch) or {}
+        for group, members in groups.items():
+            quotas[group] = sum(quotas.pop(caste, 0) for caste in members)
+        if groups:
+            quotas[MERGED_KEY] = groups
+        branch_seats[branch] = quotas
+    return branch_seats
+
+
+def generate_seat_matrix(year, gender, total_seats=None, ews_seats=None, all_india_seats=None):
+    """
+    An unsaved SeatMatrix for one cohort, apportioned from hostel capacity
+    (or `total_seats`) with the year's branch weights and caste percentages.
+    EWS, all-India and reserved seats and merged caste groups are carried
+    over from the saved matrix when there is one. Returns (seat_matrix,
+    capacity, branches, castes).
+    """
+    branches, castes = seat_matrix_inputs(year)
+    capacity = hostel_capacity(year, gender)
+    existing = SeatMatrix.objects.select_related('reserved_seats').filter(year=year, gender=gender).first()
+    merges = {}
+    if existing is not None and isinstance(existing.branch_seats, dict):
+        merges = {
+            branch: info[MERGED_KEY] for branch, info in existing.branch_seats.items()
+            if isinstance(info, dict) and isinstance(info.get(MERGED_KEY), dict)
+        }
+
+    total = capacity if total_seats is None else total_seats
+    seat_matrix = SeatMatrix(
+        year=year,
+        gender=gender,
+        total_seats=total,
+        ews_seats=ews_seats if ews_seats is not None else (existing.ews_seats if existing else 0),
+        all_india_seats=all_india_seats if all_india_seats is not None else (existing.all_india_seats if existing else 0),
+        branch_seats=generate_branch_seats(total, branches, castes, merges),
+        reserved_seats=existing.reserved_seats if existing else None,
+    )
+    return seat_matrix, capacity, branches, castes
@@ -0,0 +1,91 @@
+# adminrole/selection.py
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from authentication.models import StudentDataEntry
+from allotment.ranking import CGPA_RANKED_YEARS, assign_cgpa_branch_ranks, assign_fy_branch_ranks
+from .seat_matrix import OPEN_KEY, load_seat_matrix
+
+
+def rank_branch_students(year, gender):
+    """Rank one (year, gender) cohort within each branch. Returns the number of rows changed."""
+    if year in CGPA_RANKED_YEARS:
+        return assign_cgpa_branch_ranks([year], gender=gender)
+    return assign_fy_branch_ranks(gender=gender)
+
+
+def cohort_selection(students, matrix):
+    """
+    Run selection for one cohort in a single pass, yielding (branch, category,
+    picked students) for every quota that picked anyone; Open comes first.
+
+    `students` are (roll_no, branch, caste, branch_rank) tuples in branch_rank
+    order and `matrix` a CompiledSeatMatrix. Per branch the Open seats go to
+    the top students whatever their caste; the rest are bucketed once by the
+    category serving their caste, and each category takes the head of its
+    bucket.
+    """
+    by_branch = {}
+    for student in students:
+        by_branch.setdefault(student[1], []).append(student)
+
+    for branch_name, branch_students in by_branch.items():
+        branch = matrix.branch_index.get(branch_name)
+        if branch is None:
+            continue
+
+        open_seats = matrix.open_seats[branch]
+        if open_seats and branch_students:
+            yield branch_name, OPEN_KEY, branch_students[:open_seats]
+
+        # Students arrive in branch_rank order, so every bucket is already sorted
+        buckets = [[] for _ in matrix.categories]
+        for student in branch_students[open_seats:]:
+            category = matrix.category_of(branch, student[2])
+            if category is not None:
+                buckets[category].append(student)
+        for category, bucket in enumerate(buckets):
+            seats = matrix.quota(branch, category)
+            if seats and bucket:
+                yield branch_name, matrix.categories[category], bucket[:seats]
+
+
+def select_cohort(students, matrix):
+    """Roll numbers selected by cohort_selection()."""
+    return {student[0] for _, _, picked in cohort_selection(students, matrix) for student in picked}
+
+
+def selection_snapshot(year, gender):
+    """Verified students of one cohort as (roll_no, branch, caste, branch_rank), in branch_rank order."""
+    return list(
+        StudentDataEntry.objects.filter(
+            class_name=year,
+            gender=gender,
+            verified=True,
+        ).order_by('branch_rank').values_list('roll_no', 'branch__branch', 'caste__caste', 'branch_rank')
+    )
+
+
+def select_students(year, gender):
+    """
+    Select verified students of one cohort against its seat matrix: the Open
+    seats of each branch first, then each reserved category in turn. The
+    cohort is read once, selected in linear time by select_cohort() and
+    persisted with a single UPDATE.
+    Raises SeatMatrix.DoesNotExist when no matrix is configured.
+    Returns the number of students selected, or None if nobody is eligible.
+    """
+    matrix = load_seat_matrix(year, gender)
+
+    students = selection_snapshot(year, gender)
+
+    cohort = StudentDataEntry.objects.filter(class_name=year, gender=gender)
+    if not students:
+        cohort.update(selected=False)
+        return None
+
+    selected = select_cohort(students, matrix)
+    if not selected:
+        cohort.update(selected=False)
+        return 0
+    # One UPDATE sets the whole cohort: selected = (roll_no IN selected)
+    cohort.update(selected=ExpressionWrapper(Q(roll_no__in=selected), output_field=BooleanField()))
+    return len(selected)
@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
 from authentication.models import *
 from .models import *
+from .seat_matrix import SeatMatrixError, compile_branch_seats
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 User = get_user_model()
@@ -200,6 +201,13 @@ class SeatMatrixSerializer(serializers.ModelSerializer):
         model = SeatMatrix
         fields = ['id', 'year', 'gender', 'total_seats', 'ews_seats', 'all_india_seats', 'branch_seats', 'reserved_seats']
 
+    def validate_branch_seats(self, value):
+        try:
+            compile_branch_seats(value)
+        except SeatMatrixError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
     def create(self, validated_data):
         # Extract nested reserved_seats data
         reserved_seats_data = validated_data.pop('reserved_seats', None)
@@ -0,0 +1,85 @@
+# adminrole/signals.py
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from authentication.models import AdmissionCategory, Branch, Caste, StudentDataEntry
+from allotment.models import Block, Floor, Room, RoomGroup
+from allotment.ranking import branch_ranks_changed
+from allotment.signals import rooms_changed
+from .artifacts import ALLOTMENT_VERSION, STUDENTS_VERSION, invalidate_artifacts
+from .counters import KEY_FIELDS, adjust_counter, counter_key, stored_counter_key
+from .dashboard import invalidate_dashboard
+from .models import ReservedSeat, SeatMatrix
+from .seat_matrix import invalidate_seat_matrices
+
+
+@receiver([post_save, post_delete], sender=SeatMatrix)
+@receiver([post_save, post_delete], sender=ReservedSeat)
+@receiver([post_save, post_delete], sender=Branch)
+@receiver([post_save, post_delete], sender=Caste)
+def seat_matrix_inputs_changed(sender, **kwargs):
+    invalidate_seat_matrices()
+
+
+@receiver([post_save, post_delete], sender=StudentDataEntry)
+@receiver([post_save, post_delete], sender=Room)
+@receiver([post_save, post_delete], sender=Floor)
+@receiver([post_save, post_delete], sender=Block)
+@receiver(rooms_changed)
+def dashboard_inputs_changed(sender, **kwargs):
+    invalidate_dashboard()
+
+
+@receiver([post_save, post_delete], sender=StudentDataEntry)
+@receiver([post_save, post_delete], sender=Branch)
+@receiver([post_save, post_delete], sender=Caste)
+@receiver([post_save, post_delete], sender=AdmissionCategory)
+@receiver(branch_ranks_changed)
+def student_exports_changed(sender, **kwargs):
+    # Names and mobile numbers also appear in the allotment PDF
+    invalidate_artifacts(STUDENTS_VERSION, ALLOTMENT_VERSION)
+
+
+@receiver([post_save, post_delete], sender=Room)
+@receiver([post_save, post_delete], sender=Floor)
+@receiver([post_save, post_delete], sender=Block)
+@receiver([post_save, post_delete], sender=RoomGroup)
+@receiver(m2m_changed, sender=RoomGroup.members.through)
+@receiver(rooms_changed)
+def allotment_exports_changed(sender, **kwargs):
+    invalidate_artifacts(ALLOTMENT_VERSION)
+
+
+@receiver(pre_save, sender=StudentDataEntry)
+def remember_counter_key(sender, instance, update_fields=None, **kwargs):
+    # Read from the row rather than the instance, which may be stale or have
+    # deferred fields; StudentDataEntry.save() runs this in its transaction
+    if update_fields is not None and not set(KEY_FIELDS) & set(update_fields):
+        instance._counter_key = None
+    else:
+        instance._counter_key = stored_counter_key(instance.pk)
+
+
+@receiver(post_save, sender=StudentDataEntry)
+def count_saved_student(sender, instance, created, **kwargs):
+    old = getattr(instance, '_counter_key', None)
+    if created:
+        adjust_counter(counter_key(instance), 1)
+    elif old is not None:
+        # The row as written, whatever update_fields left out of the instance
+        new = stored_counter_key(instance.pk)
+        if old != new:
+            adjust_counter(old, -1)
+            adjust_counter(new, 1)
+
+
+@receiver(pre_delete, sender=StudentDataEntry)
+def remember_deleted_counter_key(sender, instance, **kwargs):
+    # Runs inside the delete's transaction
+    instance._counter_key = stored_counter_key(instance.pk)
+
+
+@receiver(post_delete, sender=StudentDataEntry)
+def count_deleted_student(sender, instance, **kwargs):
+    key = getattr(instance, '_counter_key', None)
+    if key is not None:
+        adjust_counter(key, -1)
@@ -0,0 +1,154 @@
+# adminrole/simulation.py
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.apps import apps
+from django.db import connections
+from allotment.engine import elapsed_ms
+from .models import SeatMatrix
+from .seat_matrix import SeatMatrixError, compile_seat_matrix, load_seat_matrix, seat_count, seat_matrix_inputs
+from .selection import cohort_selection, selection_snapshot
+
+logger = logging.getLogger(__name__)
+
+MAX_VARIANTS = 20
+# Below this many student x variant steps, starting a pool costs more than it saves
+POOL_MIN_WORK = 200000
+
+# Cohort snapshot of a simulation worker, sent once per process by the initializer
+_snapshot = None
+
+
+def summarize_selection(students, matrix):
+    """
+    Selection outcome of one seat matrix without writing anything: selected
+    count, and per branch and category the seats, students picked and cutoff
+    (the worst branch_rank that still got in).
+    """
+    branches = {
+        name: {
+            category: {"seats": seats, "selected": 0, "cutoff_rank": None}
+            for category, seats in matrix.branch_quotas(index).items()
+        }
+        for index, name in enumerate(matrix.branches)
+    }
+    selected = 0
+    for branch, category, picked in cohort_selection(students, matrix):
+        ranks = [student[3] for student in picked if student[3] is not None]
+        branches[branch][category].update(
+            selected=len(picked),
+            cutoff_rank=max(ranks) if ranks else None,
+        )
+        selected += len(picked)
+
+    seats = matrix.seats()
+    return {
+        "seats": seats,
+        "selected": selected,
+        "unfilled": seats - selected,
+        "branches": branches,
+    }
+
+
+def _init_simulation_worker(students):
+    global _snapshot
+    if not apps.ready:
+        django.setup()
+    _snapshot = students
+
+
+def timed_summary(students, matrix):
+    started = time.perf_counter()
+    summary = summarize_selection(students, matrix)
+    summary["elapsed_ms"] = elapsed_ms(started)
+    return summary
+
+
+def _summarize_in_worker(matrix):
+    return timed_summary(_snapshot, matrix)
+
+
+def compile_variant(year, gender, variant, branches, castes):
+    """CompiledSeatMatrix of one requested variant ({"branch_seats": ..., "total_seats": ...})."""
+    if not isinstance(variant, dict) or not isinstance(variant.get("branch_seats"), dict):
+        raise SeatMatrixError("each variant needs a branch_seats object")
+    total_seats = variant.get("total_seats")
+    seat_matrix = SeatMatrix(
+        year=year,
+        gender=gender,
+        total_seats=0 if total_seats is None else seat_count(total_seats, "total_seats"),
+        ews_seats=0,
+        all_india_seats=0,
+        branch_seats=variant["branch_seats"],
+    )
+    return compile_seat_matrix(seat_matrix, branches, castes)
+
+
+def simulate_selection(year, gender, variants, include_current=True, workers=None):
+    """
+    Run selection for one cohort against several candidate seat matrices,
+    reading the verified students once and writing nothing. Variants are
+    {"name", "branch_seats", "total_seats"} dicts; the saved matrix is added
+    first as "current" when include_current is set. Large runs spread the
+    variants over a process pool. Variants that do not compile are reported
+    with their error. Raises SeatMatrixError if the saved matrix does not
+    compile. Returns a summary with one result per variant, in request order.
+    """
+    started = time.perf_counter()
+    branches, castes = seat_matrix_inputs(year)
+
+    results, matrices = [], []
+    if include_current:
+        try:
+            matrices.append(load_seat_matrix(year, gender))
+            results.append({"name": "current"})
+        except SeatMatrix.DoesNotExist:
+            pass
+        except SeatMatrixError as e:
+            raise SeatMatrixError(f"Saved seat matrix for {year} {gender}: {e}") from e
+    for position, variant in enumerate(variants, start=1):
+        name = variant.get("name") if isinstance(variant, dict) else None
+        result = {"name": name or f"variant {position}"}
+        try:
+            matrices.append(compile_variant(year, gender, variant, branches, castes))
+        except SeatMatrixError as e:
+            result["error"] = str(e)
+            matrices.append(None)
+        results.append(result)
+
+    students = selection_snapshot(year, gender)
+    runnable = [index for index, matrix in enumerate(matrices) if matrix is not None]
+    if workers is None:
+        workers = min(len(runnable), os.cpu_count() or 1)
+        if len(students) * len(runnable) < POOL_MIN_WORK:
+            workers = 1
+
+    if workers <= 1:
+        summaries = [timed_summary(students, matrices[index]) for index in runnable]
+    else:
+        # Forked children must not share the parent's open database sockets
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_simulation_worker, initargs=(students,)
+        ) as pool:
+            summaries = list(pool.map(_summarize_in_worker, [matrices[index] for index in runnable]))
+
+    for index, summary in zip(runnable, summaries):
+        results[index].update(summary)
+        results[index]["warnings"] = matrices[index].warnings
+
+    summary = {
+        "year": year,
+        "gender": gender,
+        "students": len(students),
+        "workers": workers,
+        "elapsed_ms": elapsed_ms(started),
+        "variants": results,
+    }
+    logger.info(
+        f"Simulated {len(runnable)} seat matrices for {year} {gender} "
+        f"with {workers} workers in {summary['elapsed_ms']} ms"
+    )
+    return summary
@@ -0,0 +1,158 @@
+# adminrole/student_export.py
+# Exports of the verified student list, streamed row by row
+import csv
+import json
+import openpyxl
+from django.db.models import CharField, Max, Value
+from django.db.models.functions import Coalesce, Concat, Length, Trim
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+from authentication.models import StudentDataEntry
+
+# Rows fetched per round trip; on Postgres iterator() reads them through a server-side cursor
+CHUNK_SIZE = 2000
+BLOCK_SIZE = 64 * 1024
+
+EXPORT_COLUMNS = [
+    ("branch", "Branch"),
+    ("branch_rank", "ID"),
+    ("name", "Name"),
+    ("category", "Category"),
+]
+
+TEXT_FORMATS = {
+    'csv': ('csv', 'text/csv; charset=utf-8'),
+    'jsonl': ('jsonl', 'application/x-ndjson'),
+}
+
+
+def export_students(year, gender, category):
+    """Verified students of one cohort, optionally of one caste."""
+    students = StudentDataEntry.objects.filter(class_name=year, gender=gender, verified=True)
+    if category != 'all':
+        students = students.filter(caste__caste__iexact=category)
+    return students
+
+
+def export_rows(year, gender, category):
+    """
+    Verified students of one cohort as plain dicts keyed like EXPORT_COLUMNS,
+    ordered by branch then branch_rank. Only the exported columns are
+    selected and rows are fetched CHUNK_SIZE at a time.
+    """
+    students = export_students(year, gender, category).values_list(
+        'branch__branch', 'branch_rank', 'first_name', 'middle_name', 'last_name',
+        'admission_category__admission_category', 'caste__caste',
+    ).order_by('branch__branch', 'branch_rank')
+
+    for branch, branch_rank, first_name, middle_name, last_name, admission_category, caste in students.iterator(
+        chunk_size=CHUNK_SIZE
+    ):
+        yield {
+            "branch": branch,
+            "branch_rank": branch_rank,
+            "name": f"{first_name} {middle_name or ''} {last_name or ''}".strip(),
+            "category": f"{admission_category} ({caste})",
+        }
+
+
+def column_widths(year, gender, category):
+    """
+    Widest value of each EXPORT_COLUMNS column (header included) for the
+    rows export_rows() would yield, from one aggregate query.
+    """
+    text = CharField()
+    widths = export_students(year, gender, category).aggregate(
+        branch=Max(Length('branch__branch')),
+        branch_rank=Max('branch_rank'),
+        name=Max(Length(Trim(Concat(
+            'first_name', Value(' '), Coalesce('middle_name', Value('')), Value(' '),
+            Coalesce('last_name', Value('')), output_field=text,
+        )))),
+        # "<admission category> (<caste>)"
+        category=Max(Length('admission_category') + Length('caste__caste') + 3),
+    )
+    # Unranked students are exported as '-'
+    widths['branch_rank'] = len(str(widths['branch_rank'])) if widths['branch_rank'] else 1
+    return [max(len(label), widths[field] or 0) for field, label in EXPORT_COLUMNS]
+
+
+class _Line:
+    """File-like sink that hands back what csv.writer wrote instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow([label for _, label in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow([row['branch'], row['branch_rank'] or '-', row['name'], row['category']])
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def export_lines(export_format, rows):
+    """
+    `rows` rendered as csv or jsonl, encoded and joined into blocks of about
+    BLOCK_SIZE bytes so the server writes a few large chunks, not one per line.
+    """
+    lines = csv_lines(rows) if export_format == 'csv' else jsonl_lines(rows)
+    block, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        block.append(data)
+        size += len(data)
+        if size >= BLOCK_SIZE:
+            yield b''.join(block)
+            block, size = [], 0
+    if block:
+        yield b''.join(block)
+
+
+def excel_row(row):
+    return (row['branch'], row['branch_rank'] or '-', row['name'], row['category'])
+
+
+def write_excel(stream, rows, widths, title):
+    """
+    Save `rows` as a styled xlsx to `stream` using a write-only workbook.
+    openpyxl writes column widths ahead of the first row, so they are passed
+    in (see column_widths()) and each row goes straight to the sheet as it is
+    read; nothing is kept per row. `stream` must be seekable.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    for col, width in enumerate(widths, start=1):
+        sheet.column_dimensions[get_column_letter(col)].width = width + 2
+
+    border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+    alignment = Alignment(horizontal='left', vertical='center')
+    header_cells = []
+    for _, header in EXPORT_COLUMNS:
+        cell = WriteOnlyCell(sheet, header)
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+        cell.border = border
+        cell.alignment = alignment
+        header_cells.append(cell)
+    sheet.append(header_cells)
+
+    # One styled cell per column, reused for every row; the sheet copies the value and style out on append
+    cells = []
+    for _ in EXPORT_COLUMNS:
+        cell = WriteOnlyCell(sheet)
+        cell.border = border
+        cell.alignment = alignment
+        cells.append(cell)
+    for row in rows:
+        for cell, item in zip(cells, excel_row(row)):
+            cell.value = item
+        sheet.append(cells)
+
+    workbook.save(stream)
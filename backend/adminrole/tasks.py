@@ -0,0 +1,101 @@
+# adminrole/tasks.py
+# Handlers run by the job worker (python manage.py run_jobs)
+from allotment.engine import run_allotment, simulate_allotment
+from allotment.parallel import allot_all
+from .jobs import JobError, job_output, register_job, report_progress
+from .models import SeatMatrix
+from .selection import rank_branch_students, select_students
+from .student_export import TEXT_FORMATS, export_lines, export_rows
+from .views import exp_students, GeneratePDFView
+
+
+@register_job('allot_rooms')
+def allot_rooms(job, class_name, gender, seed=None, strategy=None):
+    report_progress(job, 5, f"Allotting rooms for {class_name} {gender}")
+    result = run_allotment(class_name, gender, seed=seed, strategy=strategy)
+    return {
+        "message": "Room allocation completed successfully",
+        "seed": result["seed"],
+        "strategy": result["strategy"],
+        "allocated_rooms": result["allocated_rooms"],
+        "waitlist": result["waitlist"],
+    }
+
+
+@register_job('simulate_allotment')
+def simulate_allotment_job(job, class_name, gender, seed=None, strategy=None, compare=False):
+    report_progress(job, 5, f"Simulating the allotment for {class_name} {gender}")
+    return {
+        "message": "Room allocation simulated, nothing was saved",
+        **simulate_allotment(class_name, gender, seed=seed, strategy=strategy, compare=compare),
+    }
+
+
+@register_job('allot_all_rooms')
+def allot_all_rooms(job, seed=None, strategy=None):
+    report_progress(job, 5, "Allotting rooms for all years")
+
+    def on_result(outcome, done, total):
+        report_progress(
+            job, 5 + 95 * done // total,
+            f"{outcome['class_name']} {outcome['gender']} {outcome['status']} ({done}/{total})"
+        )
+
+    return allot_all(seed=seed, strategy=strategy, on_result=on_result)
+
+
+@register_job('allot_branch_ranks')
+def allot_branch_ranks(job, year, gender):
+    if not SeatMatrix.objects.filter(year=year, gender=gender).exists():
+        raise JobError(f"No seat matrix found for year {year} and gender {gender}")
+    report_progress(job, 5, f"Ranking {year} {gender} students")
+    total_updated = rank_branch_students(year, gender)
+    report_progress(job, 60, "Selecting students against the seat matrix")
+    total_selected = select_students(year, gender)
+    return {
+        "message": f"Successfully updated branch ranks for {total_updated} {year} {gender} students and selected students based on seat matrix.",
+        "ranks_updated": total_updated,
+        "selected": total_selected or 0,
+    }
+
+
+@register_job('export_students')
+def export_students(job, year, gender, category, export_format):
+    view = exp_students()
+    students = view.get_students(year, gender, category)
+    if not students.exists():
+        raise JobError(f"No verified students found for year {year}, gender {gender}, category {category}")
+
+    report_progress(job, 10, "Rendering student list")
+    filename = view.export_filename(year, gender, category, export_format)
+    path, token = job_output(job, filename)
+    with open(path, 'wb') as stream:
+        if export_format in TEXT_FORMATS:
+            stream.writelines(export_lines(export_format, export_rows(year, gender, category)))
+        elif export_format == 'excel':
+            view.write_excel(stream, year, gender, category)
+        else:
+            view.write_pdf(stream, students, year, gender, category)
+    return {"filename": filename, "token": token}
+
+
+@register_job('allotment_pdf')
+def allotment_pdf(job, year, gender):
+    year_mapping = {
+        "first": "fy",
+        "second": "sy",
+        "third": "ty",
+        "fourth": "btech",
+    }
+    view = GeneratePDFView()
+    report_progress(job, 10, "Loading allotted rooms")
+    block_rooms = view.load_block_rooms(year_mapping[year], gender)
+    if not block_rooms:
+        raise JobError("No rooms allotted for the selected year and gender")
+
+    report_progress(job, 50, "Rendering allotment PDF")
+    filename = view.pdf_filename(year, gender)
+    path, token = job_output(job, filename)
+    with open(path, 'wb') as stream:
+        view.write_pdf(stream, block_rooms, year, gender)
+    return {"filename": filename, "token": token}
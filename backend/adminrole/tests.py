@@ -1,3 +1,432 @@
-from django.test import TestCase
+import importlib
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+from django.apps import apps
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from authentication.models import Branch, CustomUser, StudentDataEntry
+from allotment.ranking import interleaved_position
+from allotment.tests import make_student
+from . import artifacts, jobs
+from .counters import actual_counts, reconcile_counters, registration_counts
+from .jobs import JobError, claim_next_job, delete_old_job_files, enqueue, job_output, run_job
+from .models import Job, RegistrationCounter
+from .seat_matrix import OPEN_KEY, compile_branch_seats
+from .selection import select_cohort
 
-# Create your tests here.
+
+def loop_interleave(cet_count, jee_count):
+    """
+    FY order built the way assign_branch_ranks used to: blocks of
+    ceil(cet/jee) CET students then one JEE student, leftovers appended.
+    Returns (exam, index in its merit list) per branch position.
+    """
+    cet = [('mht_cet', index) for index in range(cet_count)]
+    jee = [('jee_mains', index) for index in range(jee_count)]
+    if not cet or not jee:
+        return cet or jee
+    interval = math.ceil(cet_count / jee_count)
+    ranked, cet_idx, jee_idx = [], 0, 0
+    while cet_idx < len(cet) or jee_idx < len(jee):
+        for _ in range(interval):
+            if cet_idx < len(cet):
+                ranked.append(cet[cet_idx])
+                cet_idx += 1
+        if jee_idx < len(jee):
+            ranked.append(jee[jee_idx])
+            jee_idx += 1
+        if jee_idx >= len(jee) and cet_idx < len(cet):
+            ranked.extend(cet[cet_idx:])
+            cet_idx = len(cet)
+    return ranked
+
+
+def loop_selection(students, branch_seats):
+    """
+    Roll numbers picked the way select_students used to: per branch the
+    Open seats go to the top students, then each reserved category in the
+    order of branch_seats takes its best remaining students.
+    """
+    by_branch = {}
+    for student in students:
+        by_branch.setdefault(student[1], []).append(student)
+
+    selected = set()
+    for branch_name, branch_students in by_branch.items():
+        if branch_name not in branch_seats:
+            continue
+        seats_info = branch_seats[branch_name]
+        picked = branch_students[:seats_info.get(OPEN_KEY, 0)]
+        remaining = [s for s in branch_students if s not in picked]
+        for category, seats in seats_info.items():
+            if category == OPEN_KEY:
+                continue
+            candidates = sorted(
+                (s for s in remaining if s[2].upper() == category.upper()),
+                key=lambda s: s[3] or float('inf'),
+            )
+            picked += candidates[:seats]
+            remaining = [s for s in remaining if s not in picked]
+        selected.update(student[0] for student in picked)
+    return selected
+
+
+class InterleavedPositionTests(SimpleTestCase):
+    def test_matches_the_interleaving_loop(self):
+        for cet_count in range(41):
+            for jee_count in range(41):
+                expected = loop_interleave(cet_count, jee_count)
+                positions = sorted(
+                    (interleaved_position(index, exam, cet_count, jee_count), (exam, index))
+                    for exam, index in expected
+                )
+                with self.subTest(cet=cet_count, jee=jee_count):
+                    self.assertEqual([position for position, _ in positions], list(range(len(expected))))
+                    self.assertEqual([student for _, student in positions], expected)
+
+
+class SelectionParityTests(SimpleTestCase):
+    def test_matches_the_per_category_loop(self):
+        rnd = random.Random(16)
+        castes = ['OPEN', 'OBC', 'sc', 'ST', 'NT']
+        for case in range(200):
+            branch_seats = {}
+            for branch in ('Computer', 'ENTC', 'Civil'):
+                if rnd.random() < 0.2:
+                    continue  # Students of this branch have no seats
+                seats = {OPEN_KEY: rnd.randint(0, 6)}
+                for caste in rnd.sample(castes, rnd.randint(0, len(castes))):
+                    # Categories match castes whatever their case; 'Open' itself is the general quota
+                    key = caste.upper() if caste == 'OPEN' or rnd.random() < 0.5 else caste.title()
+                    seats[key] = rnd.randint(0, 4)
+                branch_seats[branch] = seats
+
+            students = []
+            for branch in ('Computer', 'ENTC', 'Civil'):
+                count = rnd.randint(0, 25)
+                ranks = rnd.sample(range(1, count + 1), count)
+                for index, rank in enumerate(ranks):
+                    if rnd.random() < 0.1:
+                        rank = None  # Not ranked yet
+                    students.append((f"{branch}-{index}", branch, rnd.choice(castes), rank))
+            # branch_rank order with unranked students last, as the snapshot query returns them
+            students.sort(key=lambda s: (s[3] is None, s[3] or 0))
+
+            matrix = compile_branch_seats(branch_seats)
+            with self.subTest(case=case, branch_seats=branch_seats):
+                self.assertEqual(select_cohort(students, matrix), loop_selection(students, branch_seats))
+
+
+def failing_job(job):
+    raise RuntimeError("database went away")
+
+
+def rejected_job(job):
+    raise JobError("nothing to process")
+
+
+class JobQueueTests(TransactionTestCase):
+    def setUp(self):
+        handlers = mock.patch.dict(jobs.JOB_HANDLERS, {
+            'echo': lambda job, value=None: {"value": value},
+            'flaky': failing_job,
+            'rejected': rejected_job,
+        })
+        handlers.start()
+        self.addCleanup(handlers.stop)
+        # No heartbeat thread; the tests set heartbeat_at themselves
+        heartbeat = mock.patch.object(jobs.Heartbeat, 'start')
+        heartbeat.start()
+        self.addCleanup(heartbeat.stop)
+        stop = mock.patch.object(jobs.Heartbeat, 'stop')
+        stop.start()
+        self.addCleanup(stop.stop)
+
+    def test_claims_the_oldest_runnable_job(self):
+        later = enqueue('echo')
+        later.run_after = timezone.now() + timedelta(minutes=5)
+        later.save()
+        first = enqueue('echo', {"value": 1})
+        second = enqueue('echo', {"value": 2})
+
+        job = claim_next_job('worker-1')
+        self.assertEqual(job.id, first.id)
+        self.assertEqual((job.status, job.attempts, job.worker), ("running", 1, 'worker-1'))
+        self.assertEqual(claim_next_job('worker-1').id, second.id)
+        self.assertIsNone(claim_next_job('worker-1'))
+
+    def test_success_stores_the_result(self):
+        enqueue('echo', {"value": 3})
+        job = run_job(claim_next_job('worker-1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress, job.result), ("succeeded", 100, {"value": 3}))
+
+    def test_failure_is_retried_with_backoff(self):
+        enqueue('flaky', max_attempts=3)
+        for attempt in (1, 2):
+            with self.assertLogs('adminrole.jobs', 'ERROR'):
+                job = run_job(claim_next_job('worker-1'))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ("queued", attempt))
+            delay = job.run_after - job.finished_at
+            self.assertEqual(delay, timedelta(seconds=jobs.RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)))
+            # Not runnable before the backoff has passed
+            self.assertIsNone(claim_next_job('worker-1'))
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+        with self.assertLogs('adminrole.jobs', 'ERROR'):
+            job = run_job(claim_next_job('worker-1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 3))
+        self.assertIn("database went away", job.error)
+        self.assertIsNone(claim_next_job('worker-1'))
+
+    def test_job_error_fails_without_retry(self):
+        enqueue('rejected', max_attempts=3)
+        with self.assertLogs('adminrole.jobs', 'ERROR'):
+            job = run_job(claim_next_job('worker-1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.message), ("failed", 1, "nothing to process"))
+
+    def test_stale_jobs_are_reclaimed_until_attempts_run_out(self):
+        stale = timezone.now() - jobs.STALE_AFTER - timedelta(minutes=1)
+        fresh = Job.objects.create(kind='echo', status="running", attempts=1, heartbeat_at=timezone.now())
+        retry = Job.objects.create(kind='echo', status="running", attempts=1, max_attempts=3, heartbeat_at=stale)
+        dead = Job.objects.create(kind='echo', status="running", attempts=3, max_attempts=3, heartbeat_at=stale)
+
+        job = claim_next_job('worker-2')
+        self.assertEqual((job.id, job.attempts, job.worker), (retry.id, 2, 'worker-2'))
+        self.assertIsNone(claim_next_job('worker-2'))
+
+        dead.refresh_from_db()
+        self.assertEqual(dead.status, "failed")
+        self.assertIsNotNone(dead.finished_at)
+        fresh.refresh_from_db()
+        self.assertEqual((fresh.status, fresh.attempts), ("running", 1))
+
+class HeartbeatTests(TransactionTestCase):
+    def test_heartbeat_keeps_a_long_job_alive(self):
+        job = Job.objects.create(
+            kind='echo', status="running", attempts=1, heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        with mock.patch.object(jobs, 'HEARTBEAT_SECONDS', 0.05):
+            heartbeat = jobs.Heartbeat(job)
+            heartbeat.start()
+            time.sleep(0.3)
+            heartbeat.stop()
+        job.refresh_from_db()
+        self.assertGreater(job.heartbeat_at, timezone.now() - timedelta(minutes=1))
+
+
+class JobFileRetentionTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = override_settings(EXPORTS_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_deletes_only_directories_past_retention(self):
+        old_path, _ = job_output(None, 'old.csv')
+        new_path, _ = job_output(None, 'new.csv')
+        for path in (old_path, new_path):
+            with open(path, 'w') as stream:
+                stream.write('roll_no\n')
+        expired = time.time() - jobs.JOB_FILE_RETENTION.total_seconds() - 60
+        os.utime(os.path.dirname(old_path), (expired, expired))
+
+        self.assertEqual(delete_old_job_files(), 1)
+        self.assertFalse(os.path.exists(os.path.dirname(old_path)))
+        self.assertTrue(os.path.exists(new_path))
+
+
+def nonzero(counts):
+    """Counts without the (class_name, gender) keys whose statuses are all 0."""
+    return {key: statuses for key, statuses in counts.items() if any(statuses.values())}
+
+
+class RegistrationCounterTests(TestCase):
+    def setUp(self):
+        self.fy = Branch.objects.create(branch='Computer', year='fy')
+        self.sy = Branch.objects.create(branch='Computer', year='sy')
+        self.students = [
+            make_student('fy1', self.fy, class_name='fy'),
+            make_student('fy2', self.fy, class_name='fy', verified=True),
+            make_student('sy1', self.sy, gender='female', verified=False),
+        ]
+
+    def assertCountersMatch(self):
+        self.assertEqual(nonzero(registration_counts()), nonzero(actual_counts()))
+
+    def test_created_students_are_counted(self):
+        self.assertEqual(registration_counts(), {
+            ('fy', 'male'): {"pending": 1, "verified": 1, "rejected": 0},
+            ('sy', 'female'): {"pending": 0, "verified": 0, "rejected": 1},
+        })
+        self.assertCountersMatch()
+
+    def test_status_changes_move_the_student(self):
+        student = self.students[0]
+        for verified in (True, False, None, False):
+            student.verified = verified
+            student.save()
+            self.assertCountersMatch()
+        self.assertEqual(registration_counts()[('fy', 'male')], {"pending": 0, "verified": 1, "rejected": 1})
+
+    def test_class_and_gender_changes_move_the_student(self):
+        student = self.students[1]
+        student.class_name = 'sy'
+        student.branch = self.sy
+        student.save()
+        self.assertCountersMatch()
+        student.gender = 'female'
+        student.save()
+        self.assertCountersMatch()
+        self.assertEqual(registration_counts()[('sy', 'female')]["verified"], 1)
+
+    def test_update_fields_saves(self):
+        student = self.students[0]
+        student.verified = True
+        student.save(update_fields=['verified'])
+        self.assertCountersMatch()
+        # A status set on the instance but left out of update_fields is not written
+        student.verified = False
+        student.first_name = 'Renamed'
+        student.save(update_fields=['first_name'])
+        self.assertCountersMatch()
+        self.assertEqual(registration_counts()[('fy', 'male')]["verified"], 2)
+
+    def test_deferred_and_stale_instances(self):
+        deferred = StudentDataEntry.objects.only('roll_no', 'first_name').get(pk='fy1')
+        deferred.first_name = 'Renamed'
+        deferred.save()
+        self.assertCountersMatch()
+        deferred.verified = False
+        deferred.save()
+        self.assertCountersMatch()
+
+        # A stale copy writes its old status back; the counters follow the row
+        stale = StudentDataEntry.objects.get(pk='fy2')
+        fresh = StudentDataEntry.objects.get(pk='fy2')
+        fresh.verified = None
+        fresh.save()
+        stale.save()
+        self.assertCountersMatch()
+        self.assertEqual(registration_counts()[('fy', 'male')], {"pending": 0, "verified": 1, "rejected": 1})
+
+    def test_deleted_students_are_uncounted(self):
+        self.students[0].delete()
+        self.assertCountersMatch()
+        StudentDataEntry.objects.filter(class_name='sy').delete()
+        self.assertCountersMatch()
+        self.assertEqual(nonzero(registration_counts()), {
+            ('fy', 'male'): {"pending": 0, "verified": 1, "rejected": 0},
+        })
+
+    def test_migration_backfill(self):
+        migration = importlib.import_module('adminrole.migrations.0011_registrationcounter')
+        template = self.students[0]
+        fields = [field.attname for field in StudentDataEntry._meta.concrete_fields]
+        # bulk_create sends no signals, like rows that predate the counters
+        StudentDataEntry.objects.bulk_create([
+            StudentDataEntry(**{
+                **{field: getattr(template, field) for field in fields},
+                'roll_no': f"bulk{index}",
+                'personal_mail': f"bulk{index}@example.com",
+                'verified': [None, True, False][index % 3],
+            })
+            for index in range(7)
+        ])
+        RegistrationCounter.objects.all().delete()
+        migration.build_counters(apps, None)
+        self.assertEqual(registration_counts(), actual_counts())
+        self.assertEqual(registration_counts()[('fy', 'male')], {"pending": 4, "verified": 3, "rejected": 2})
+
+    def test_reconcile_repairs_drift(self):
+        # Queryset updates send no signals, so the counters drift
+        StudentDataEntry.objects.filter(class_name='fy').update(verified=False)
+        self.assertNotEqual(nonzero(registration_counts()), nonzero(actual_counts()))
+
+        drift = reconcile_counters(dry_run=True)
+        self.assertEqual(drift, [
+            ('fy', 'male', "pending", 1, 0),
+            ('fy', 'male', "rejected", 0, 2),
+            ('fy', 'male', "verified", 1, 0),
+        ])
+        self.assertNotEqual(nonzero(registration_counts()), nonzero(actual_counts()))
+
+        self.assertEqual(reconcile_counters(), drift)
+        self.assertCountersMatch()
+        self.assertEqual(reconcile_counters(), [])
+
+
+class ArtifactViewTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings = override_settings(EXPORTS_ROOT=root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        branch = Branch.objects.create(branch='Computer', year='sy')
+        self.student = make_student('sy1', branch, cgpa=8.0, verified=True)
+        make_student('sy2', branch, cgpa=7.0, verified=True)
+        manager = CustomUser.objects.create(username='manager', email='manager@example.com', user_type='manager')
+        self.client = APIClient()
+        self.client.force_authenticate(manager)
+
+    def export(self, export_format='pdf', **headers):
+        response = self.client.get(
+            reverse('exp_stu'), {'year': 'sy', 'gender': 'male', 'exp_format': export_format}, **headers
+        )
+        if response.streaming:
+            b''.join(response.streaming_content)
+        response.close()
+        return response
+
+    def test_if_none_match_gets_304(self):
+        for export_format in ('pdf', 'excel'):
+            with self.subTest(export_format=export_format):
+                first = self.export(export_format)
+                self.assertEqual(first.status_code, 200)
+                second = self.export(export_format, HTTP_IF_NONE_MATCH=first['ETag'])
+                self.assertEqual(second.status_code, 304)
+                self.assertEqual(second['ETag'], first['ETag'])
+                self.assertEqual(self.export(export_format, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_if_modified_since_gets_304(self):
+        first = self.export()
+        second = self.export(HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(second.status_code, 304)
+
+    def test_expired_artifact_is_rendered_again(self):
+        first = self.export()
+        artifact = artifacts.Artifact(
+            'exp_students', ['sy', 'male', 'all', 'pdf'], [artifacts.STUDENTS_VERSION], 'pdf'
+        )
+        expired = time.time() - artifacts.MAX_AGE - 60
+        os.utime(artifact.path, (expired, expired))
+
+        second = self.export(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertGreater(os.path.getmtime(artifact.path), expired)
+
+    def test_student_change_gives_a_new_etag(self):
+        first = self.export()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.first_name = 'Renamed'
+            self.student.save()
+
+        second = self.export(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(self.export(HTTP_IF_NONE_MATCH=second['ETag']).status_code, 304)
@@ -6,6 +6,7 @@ urlpatterns = [
     path('students/verified/', VerifiedStudentsView.as_view(), name='verified-students'),
     path('students/rejected/', RejectedStudentsView.as_view(), name='rejected-students'),
     path('students/year/', StudentsByYearView.as_view(), name='students-by-year'),
+    path('students/counts/', StudentCountsView.as_view(), name='student-counts'),
     path('students/<str:roll_no>/', StudentDetailView.as_view(), name='student-detail'),
     path("wardens/", WardensView.as_view(), name="wardens"),
     path("wardens/<int:user_id>/", WardensView.as_view(), name="warden-detail"),
@@ -13,14 +14,18 @@ urlpatterns = [
     path("managers/<int:user_id>/", ManagersView.as_view(), name="manager-detail"),
     path("students/", StudentsView.as_view(), name="students"),
     path("seat-matrix/", SeatMatrixView.as_view(), name="seat-matrix"),
+    path("seat-matrix/generate/", GenerateSeatMatrixView.as_view(), name="seat-matrix-generate"),
     path("dashboard/", DashboardView.as_view(), name="dashboard"),
     path("allot-branch-ranks/", AllotBranchRanksView.as_view(), name="allot-branch-ranks"),
     # path('select-students/', SelectStudentsView.as_view(), name='select-students'),
     path('exp_stu/',exp_students.as_view(), name='exp_stu'),
+    path('import_merit/', ImportMeritView.as_view(), name='import_merit'),
     path('open-registration/', OpenRegistrationsView.as_view(), name='open-registration'),
     path('open-room-preference/', OpenRoomPreferencesView.as_view(), name='open-room-preferences'),
     path('allot_rooms/',AllotRoomsView.as_view(),
     name="allot_rooms"),
+    path('allot_all_rooms/', AllotAllRoomsView.as_view(), name="allot_all_rooms"),
+    path('reallot_rooms/', ReallotRoomsView.as_view(), name="reallot_rooms"),
     path('generate_pdf/',GeneratePDFView.as_view(),name="generate_pdf"),
     # path("check_allotment/", CheckAllotmentView.as_view(), name="check_allotment"),
     # path("record_allotment/", RecordAllotmentView.as_view(), name="record_allotment"),
@@ -32,4 +37,7 @@ urlpatterns = [
     path('manual_override/', ManualOverrideView.as_view(), name='manual_override'),
     path('branches/', FetchBranchesView.as_view(), name='open-room-preferences'),
     path('select-students/', SelectStudentsAndRankView.as_view(), name='open-room-preferences'),
+    path('simulate-selection/', SimulateSelectionView.as_view(), name='simulate-selection'),
+    path('jobs/<int:job_id>/', JobStatusView.as_view(), name='job-status'),
+    path('jobs/<int:job_id>/file/<str:token>/', JobFileView.as_view(), name='job-file'),
 ]
@@ -0,0 +1,29 @@
+# adminrole/versions.py
+from django.db.models import F
+from .models import CacheVersion
+
+# Cached values are stored under keys that embed a version number; bumping the
+# version orphans every entry built from the old inputs, which then expire.
+# The numbers live in the database, not the cache: the file cache culls random
+# keys when full, and a culled counter restarting at 1 would make entries of
+# an old version valid again.
+
+
+def get_version(name):
+    """Current version of `name`, starting at 1."""
+    version = CacheVersion.objects.filter(name=name).values_list('version', flat=True).first()
+    return 1 if version is None else version
+
+
+def bump_version(name):
+    """Invalidate everything cached under the current version of `name`."""
+    if not CacheVersion.objects.filter(name=name).update(version=F('version') + 1):
+        _, created = CacheVersion.objects.get_or_create(name=name, defaults={'version': 2})
+        if not created:
+            # Another process created the row first
+            CacheVersion.objects.filter(name=name).update(version=F('version') + 1)
+    return get_version(name)
+
+
+def versioned_key(name, *parts):
+    return ':'.join([name, str(get_version(name)), *map(str, parts)])
@@ -3,26 +3,41 @@ from rest_framework.response import Response
 from rest_framework import status
 from authentication.models import *
 from allotment.models import *
+from allotment.engine import run_allotment, run_reallotment, simulate_allotment
+from allotment.parallel import allot_all
+from allotment.ranking import branch_ranks_changed
+from allotment.signals import rooms_changed
+from allotment.strategies import STRATEGIES, DEFAULT_STRATEGY, AllotmentTooLarge
+from .artifacts import ALLOTMENT_VERSION, STUDENTS_VERSION, Artifact
+from .counters import STATUSES, registration_counts
+from .dashboard import cached_dashboard
+from .jobs import enqueue, is_true, is_background, job_accepted, job_file, job_payload
+from .merit_import import MeritImportError, import_merit
+from .seat_matrix import SeatMatrixError, compile_seat_matrix, generate_seat_matrix, load_seat_matrix
+from .selection import rank_branch_students, select_students
+from .simulation import MAX_VARIANTS, simulate_selection
+from .student_export import TEXT_FORMATS, column_widths, export_lines, export_rows, write_excel
 from .serializers import *
 from authentication.permissions import *
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import FormParser, MultiPartParser
 from .models import *
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.utils import timezone
-from django.db.models import Count, Sum
 from django.db.models import Q
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from io import BytesIO
-from django.http import HttpResponse
-import openpyxl
-from openpyxl.styles import Font, Alignment, Border, Side
+from django.http import FileResponse, StreamingHttpResponse
+import time
 from django.core.exceptions import FieldError
 from django.db import transaction, ProgrammingError
-from django.db.models import Window, F
+from django.db.models import Prefetch, Window, F
 from django.db.models.functions import Rank
+import logging
+
+logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
@@ -35,11 +50,16 @@ class SeatMatrixView(APIView):
         if not year or not gender:
             return Response({"error": "Year and gender are required"}, status=status.HTTP_400_BAD_REQUEST)
         try:
+            if is_true(request.query_params.get('compiled')):
+                # Per-branch quotas as selection sees them, with validation warnings
+                return Response(load_seat_matrix(year, gender).as_dict(), status=status.HTTP_200_OK)
             seat_matrix = SeatMatrix.objects.get(year=year, gender=gender)
             serializer = SeatMatrixSerializer(seat_matrix)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except SeatMatrix.DoesNotExist:
             return Response({"error": "Seat matrix not found"}, status=status.HTTP_404_NOT_FOUND)
+        except SeatMatrixError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     def post(self, request):
         year = request.data.get('year')
@@ -59,6 +79,73 @@ class SeatMatrixView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class GenerateSeatMatrixView(APIView):
+    """
+    Derive a seat matrix from hostel capacity, branch weights and caste
+    percentages. Returns a preview unless save=true.
+    """
+    permission_classes = [IsAuthenticated, IsStaffUser]
+
+    def post(self, request):
+        year = request.data.get('year')
+        gender = request.data.get('gender')
+        valid_years = [choice[0] for choice in SeatMatrix.YEAR_CHOICES]
+        valid_genders = [choice[0] for choice in SeatMatrix.GENDER_CHOICES]
+        if year not in valid_years or gender not in valid_genders:
+            return Response(
+                {"error": f"Year must be one of {', '.join(valid_years)} and gender one of {', '.join(valid_genders)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        counts = {}
+        for field in ('total_seats', 'ews_seats', 'all_india_seats'):
+            value = request.data.get(field)
+            if value in (None, ''):
+                continue
+            try:
+                counts[field] = int(value)
+            except (TypeError, ValueError):
+                counts[field] = -1
+            if counts[field] < 0:
+                return Response({"error": f"{field} must be a non-negative integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            started = time.perf_counter()
+            seat_matrix, capacity, branches, castes = generate_seat_matrix(year, gender, **counts)
+            compiled = compile_seat_matrix(seat_matrix, branches, castes)
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+
+            saved = is_true(request.data.get('save'))
+            if saved:
+                with transaction.atomic():
+                    if seat_matrix.reserved_seats is None:
+                        seat_matrix.reserved_seats = ReservedSeat.objects.create()
+                    SeatMatrix.objects.update_or_create(
+                        year=year,
+                        gender=gender,
+                        defaults={
+                            "total_seats": seat_matrix.total_seats,
+                            "ews_seats": seat_matrix.ews_seats,
+                            "all_india_seats": seat_matrix.all_india_seats,
+                            "branch_seats": seat_matrix.branch_seats,
+                            "reserved_seats": seat_matrix.reserved_seats,
+                        },
+                    )
+
+            return Response({
+                "message": f"Generated a {seat_matrix.total_seats} seat matrix for {year} {gender}" + (" and saved it." if saved else "."),
+                "capacity": capacity,
+                "saved": saved,
+                "elapsed_ms": elapsed_ms,
+                "seat_matrix": SeatMatrixSerializer(seat_matrix).data,
+                "compiled": compiled.as_dict(),
+            }, status=status.HTTP_200_OK)
+        except SeatMatrixError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class OpenRegistrationsView(APIView):
     permission_classes = [IsAuthenticated, IsManager]
 
@@ -252,6 +339,24 @@ class PendingStudentsView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+class StudentCountsView(APIView):
+    """Pending/verified/rejected counts per year and gender, read from the registration counters."""
+    permission_classes = [IsAuthenticated, IsManager]
+
+    def get(self, request):
+        filters = {}
+        year = request.query_params.get('class_name')
+        if year and year in dict(StudentDataEntry.CLASS_CHOICES).keys():
+            filters['class_name'] = year
+        counts = registration_counts(**filters)
+        totals = dict.fromkeys(STATUSES, 0)
+        data = {}
+        for (class_name, gender), statuses in sorted(counts.items()):
+            data.setdefault(class_name, {})[gender] = statuses
+            for status_name, count in statuses.items():
+                totals[status_name] += count
+        return Response({"data": data, "totals": totals}, status=status.HTTP_200_OK)
+
 class VerifiedStudentsView(APIView):
     permission_classes = [IsAuthenticated, IsManager]
 
@@ -432,37 +537,19 @@ class AllotBranchRanksView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Filter students, excluding manually modified ones
-            students = StudentDataEntry.objects.filter(
-                class_name=year,
-                gender=gender,
-            ).select_related('branch')
+            if is_background(request):
+                job = enqueue('allot_branch_ranks', {"year": year, "gender": gender}, user=request.user)
+                return job_accepted(request, job)
 
-            if not students.exists():
+            if not StudentDataEntry.objects.filter(class_name=year, gender=gender).exists():
                 return Response(
                     {"message": f"No {year} {gender} students found."},
                     status=status.HTTP_200_OK
                 )
 
-            # Group students by branch
-            branch_groups = {}
-            for student in students:
-                branch_id = student.branch_id
-                if branch_id not in branch_groups:
-                    branch_groups[branch_id] = []
-                branch_groups[branch_id].append(student)
-
-            # Assign branch ranks
-            total_updated = 0
-            for branch_id, students in branch_groups.items():
-                sorted_students = sorted(students, key=lambda s: (s.cgpa if s.cgpa is not None else 0), reverse=True)
-                for rank, student in enumerate(sorted_students, start=1):
-                    if student.branch_rank != rank:
-                        student.branch_rank = rank
-                        student.save(update_fields=['branch_rank'])
-                        total_updated += 1
-
-            # Call SelectStudentsView, passing the same request
+            total_updated = rank_branch_students(year, gender)
+
+            # Select students with the fresh ranks
             select_view = SelectStudentsView()
             select_response = select_view.post(request)
 
@@ -503,81 +590,19 @@ class SelectStudentsView(APIView):
                 )
 
             try:
-                seat_matrix = SeatMatrix.objects.get(year=year, gender=gender)
+                total_selected = select_students(year, gender)
             except SeatMatrix.DoesNotExist:
                 return Response(
                     {"error": f"No seat matrix found for year {year} and gender {gender}"},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            # Preserve manually modified students
-            StudentDataEntry.objects.filter(
-                class_name=year,
-                gender=gender,
-                is_manually_modified=False
-            ).update(
-                selected=False,
-                last_selection_year=year
-            )
-
-            students = StudentDataEntry.objects.filter(
-                class_name=year,
-                gender=gender,
-                verified=True,
-                is_manually_modified=False
-            ).select_related('branch', 'caste').order_by('branch_rank')
-
-            if not students.exists():
+            if total_selected is None:
                 return Response(
                     {"message": f"No verified {year} {gender} students found to select."},
                     status=status.HTTP_200_OK
                 )
 
-            branch_seats = seat_matrix.branch_seats
-            branch_groups = {}
-            for student in students:
-                branch_name = student.branch.branch
-                if branch_name not in branch_groups:
-                    branch_groups[branch_name] = []
-                branch_groups[branch_name].append(student)
-
-            total_selected = 0
-            for branch_name, branch_students in branch_groups.items():
-                if branch_name not in branch_seats:
-                    continue
-
-                branch_seat_info = branch_seats[branch_name]
-                open_seats = branch_seat_info.get("Open", 0)
-                remaining_students = branch_students.copy()
-                open_selected = []
-                for student in remaining_students:
-                    if open_seats <= 0:
-                        break
-                    open_selected.append(student)
-                    open_seats -= 1
-                    total_selected += 1
-
-                remaining_students = [s for s in remaining_students if s not in open_selected]
-                reserved_categories = {k: v for k, v in branch_seat_info.items() if k != "Open"}
-                for category, seats in reserved_categories.items():
-                    category_students = [
-                        s for s in remaining_students
-                        if s.caste.caste.upper() == category.upper()
-                    ]
-                    category_students.sort(key=lambda s: s.branch_rank or float('inf'))
-                    for student in category_students:
-                        if seats <= 0:
-                            break
-                        open_selected.append(student)
-                        seats -= 1
-                        total_selected += 1
-                    remaining_students = [s for s in remaining_students if s not in open_selected]
-
-                for student in open_selected:
-                    student.selected = True
-                    student.last_selection_year = year
-                    student.save(update_fields=['selected', 'last_selection_year'])
-
             return Response(
                 {"message": f"Successfully selected {total_selected} {year} {gender} students based on seat matrix."},
                 status=status.HTTP_200_OK
@@ -589,6 +614,66 @@ class SelectStudentsView(APIView):
             )
 
 
+class ImportMeritView(APIView):
+    """Bulk rank/CGPA/backlogs update from an uploaded merit-list CSV or XLSX."""
+    permission_classes = [IsAuthenticated, IsManager]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "Upload the merit list as 'file'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            report = import_merit(upload, upload.name, dry_run=is_true(request.data.get('dry_run')))
+        except MeritImportError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        report["message"] = (
+            f"{'Would update' if report['dry_run'] else 'Updated'} {report['updated_entries']} students from {report['rows']} rows "
+            f"with {len(report['errors'])} errors."
+        )
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class SimulateSelectionView(APIView):
+    """What-if selection of one cohort against several seat matrices; nothing is written."""
+    permission_classes = [IsAuthenticated, IsManager]
+
+    def post(self, request):
+        year = request.data.get('year')
+        gender = request.data.get('gender', 'male')
+        variants = request.data.get('variants') or []
+        valid_years = [choice[0] for choice in StudentDataEntry.CLASS_CHOICES]
+        if not year or year not in valid_years:
+            return Response(
+                {"error": f"Invalid year. Must be one of: {', '.join(valid_years)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        valid_genders = [choice[0] for choice in StudentDataEntry.GENDER_CHOICES]
+        if gender not in valid_genders:
+            return Response(
+                {"error": f"Invalid gender. Must be one of: {', '.join(valid_genders)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not isinstance(variants, list) or len(variants) > MAX_VARIANTS:
+            return Response(
+                {"error": f"variants must be a list of at most {MAX_VARIANTS} seat matrices"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            include_current = request.data.get('include_current', True)
+            summary = simulate_selection(year, gender, variants, include_current=is_true(include_current))
+            return Response(summary, status=status.HTTP_200_OK)
+        except SeatMatrixError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class exp_students(APIView):
     permission_classes = [IsAuthenticated, IsManager]
 
@@ -597,7 +682,7 @@ class exp_students(APIView):
             year = request.query_params.get('year', 'fy')
             gender = request.query_params.get('gender', 'male')
             category = request.query_params.get('category', 'all')
-            export_format = request.query_params.get('exp_format', 'pdf')  # 'pdf' or 'excel'
+            export_format = request.query_params.get('exp_format', 'pdf')  # 'pdf', 'excel', 'csv' or 'jsonl'
 
             valid_years = [choice[0] for choice in StudentDataEntry.CLASS_CHOICES]
             if year not in valid_years:
@@ -612,23 +697,49 @@ class exp_students(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            query = Q(class_name=year, gender=gender, verified=True)
-            if category != 'all':
-                query &= Q(caste__caste__iexact=category)
-
-            students = StudentDataEntry.objects.filter(query).select_related('branch', 'caste', 'admission_category').order_by('branch__branch', 'branch_rank')
+            if is_background(request):
+                job = enqueue(
+                    'export_students',
+                    {"year": year, "gender": gender, "category": category, "export_format": export_format},
+                    user=request.user,
+                )
+                return job_accepted(request, job)
+
+            students = self.get_students(year, gender, category)
+            if export_format not in TEXT_FORMATS and export_format != 'excel':
+                export_format = 'pdf'  # Default to PDF
+
+            # A stored copy of an unchanged list is served without touching the students table
+            artifact = None
+            if export_format not in TEXT_FORMATS:
+                extension = 'xlsx' if export_format == 'excel' else 'pdf'
+                artifact = Artifact(
+                    'exp_students', [year, gender, category, export_format], [STUDENTS_VERSION], extension
+                )
 
-            if not students.exists():
+            if (artifact is None or artifact.mtime is None) and not students.exists():
                 return Response(
                     {"error": f"No verified students found for year {year}, gender {gender}, category {category}"},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
+            if export_format in TEXT_FORMATS:
+                return self.stream_text(export_format, year, gender, category)
+
             if export_format == 'excel':
-                return self.generate_excel(students, year, gender, category)
+                return artifact.response(
+                    request,
+                    lambda stream: self.write_excel(stream, year, gender, category),
+                    self.export_filename(year, gender, category, export_format),
+                    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                )
 
-            # Default to PDF
-            return self.generate_pdf(students, year, gender, category)
+            return artifact.response(
+                request,
+                lambda stream: self.write_pdf(stream, students, year, gender, category),
+                self.export_filename(year, gender, category, export_format),
+                'application/pdf',
+            )
 
         except Exception as e:
             return Response(
@@ -636,9 +747,32 @@ class exp_students(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def generate_pdf(self, students, year, gender, category):
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
+    @staticmethod
+    def get_students(year, gender, category):
+        query = Q(class_name=year, gender=gender, verified=True)
+        if category != 'all':
+            query &= Q(caste__caste__iexact=category)
+        return StudentDataEntry.objects.filter(query).select_related('branch', 'caste', 'admission_category').order_by('branch__branch', 'branch_rank')
+
+    @staticmethod
+    def export_filename(year, gender, category, export_format):
+        if export_format in TEXT_FORMATS:
+            extension = TEXT_FORMATS[export_format][0]
+        else:
+            extension = 'xlsx' if export_format == 'excel' else 'pdf'
+        return f"students_{year}_{gender}_{category}.{extension}"
+
+    def stream_text(self, export_format, year, gender, category):
+        # Rows go out as they are read, so memory stays flat and nothing is built up front
+        response = StreamingHttpResponse(
+            export_lines(export_format, export_rows(year, gender, category)),
+            content_type=TEXT_FORMATS[export_format][1],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.export_filename(year, gender, category, export_format)}"'
+        return response
+
+    def write_pdf(self, stream, students, year, gender, category):
+        doc = SimpleDocTemplate(stream, pagesize=letter)
         elements = []
         styles = getSampleStyleSheet()
         title_style = ParagraphStyle(name='Title', fontSize=16, alignment=1, spaceAfter=20)
@@ -668,8 +802,8 @@ class exp_students(APIView):
             data = [['ID', 'Name', 'Category']]
             for student in branch_students:
                 full_name = f"{student.first_name} {student.middle_name or ''} {student.last_name or ''}".strip()
-                category = f"{student.admission_category.admission_category} ({student.caste.caste})"
-                data.append([str(student.branch_rank or '-'), full_name, category])
+                student_category = f"{student.admission_category.admission_category} ({student.caste.caste})"
+                data.append([str(student.branch_rank or '-'), full_name, student_category])
 
             # Create table
             table = Table(data)
@@ -687,80 +821,14 @@ class exp_students(APIView):
             elements.append(Spacer(1, 12))
 
         doc.build(elements)
-        buffer.seek(0)
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="students_{year}_{gender}_{category}.pdf"'
-        response.write(buffer.getvalue())
-        buffer.close()
-        return response
-
-    def generate_excel(self, students, year, gender, category):
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        sheet.title = f"Students_{year}_{gender}_{category}"
-
-        # Define styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = openpyxl.styles.PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-        border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-        alignment = Alignment(horizontal='left', vertical='center')
-
-        # Headers
-        headers = ['Branch', 'ID', 'Name', 'Category']
-        for col, header in enumerate(headers, start=1):
-            cell = sheet.cell(row=1, column=col)
-            cell.value = header
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = border
-            cell.alignment = alignment
 
-        # Group students by branch
-        branch_groups = {}
-        for student in students:
-            branch_name = student.branch.branch
-            if branch_name not in branch_groups:
-                branch_groups[branch_name] = []
-            branch_groups[branch_name].append(student)
-
-        # Write data
-        row = 2
-        for branch_name in sorted(branch_groups.keys()):
-            for student in branch_groups[branch_name]:
-                full_name = f"{student.first_name} {student.middle_name or ''} {student.last_name or ''}".strip()
-                category = f"{student.admission_category.admission_category} ({student.caste.caste})"
-                sheet.cell(row=row, column=1).value = branch_name
-                sheet.cell(row=row, column=2).value = student.branch_rank or '-'
-                sheet.cell(row=row, column=3).value = full_name
-                sheet.cell(row=row, column=4).value = category
-                for col in range(1, 5):
-                    sheet.cell(row=row, column=col).border = border
-                    sheet.cell(row=row, column=col).alignment = alignment
-                row += 1
-
-        # Adjust column widths
-        for col in sheet.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = (max_length + 2)
-            sheet.column_dimensions[column].width = adjusted_width
-
-        buffer = BytesIO()
-        workbook.save(buffer)
-        buffer.seek(0)
-        response = HttpResponse(
-            content_type='application/vnd.openxml`format`s-officedocument.spreadsheetml.sheet'
+    def write_excel(self, stream, year, gender, category):
+        write_excel(
+            stream,
+            export_rows(year, gender, category),
+            column_widths(year, gender, category),
+            f"Students_{year}_{gender}_{category}",
         )
-        response['Content-Disposition'] = f'attachment; filename="students_{year}_{gender}_{category}.xlsx"'
-        response.write(buffer.getvalue())
-        buffer.close()
-        return response
 
 
 class DashboardView(APIView):
@@ -768,100 +836,21 @@ class DashboardView(APIView):
 
     def get(self, request):
         try:
-            year_mapping = {
-                "fy": "First Year",
-                "sy": "Second Year",
-                "ty": "Third Year",
-                "btech": "Final Year",
-            }
-            year_data = {
-                "first-year": {"name": "First Year", "male": {}, "female": {}},
-                "second-year": {"name": "Second Year", "male": {}, "female": {}},
-                "third-year": {"name": "Third Year", "male": {}, "female": {}},
-                "final-year": {"name": "Final Year", "male": {}, "female": {}},
-            }
-            overall_stats = {
-                "totalSeats": 0,
-                "totalRegistrations": 0,
-                "totalVerified": 0,
-                "totalPendingVerifications": 0,
-            }
-            total_registrations = StudentDataEntry.objects.count()
-            total_verified = StudentDataEntry.objects.filter(verified=True).count()
-            total_pending = StudentDataEntry.objects.filter(verified=None).count()
-            overall_stats["totalRegistrations"] = total_registrations
-            overall_stats["totalVerified"] = total_verified
-            overall_stats["totalPendingVerifications"] = total_pending
-            for year_key, year_name in year_mapping.items():
-                class_name = year_key
-                frontend_year_key = {
-                    "fy": "first-year",
-                    "sy": "second-year",
-                    "ty": "third-year",
-                    "btech": "final-year",
-                }[year_key]
-                for gender in ["male", "female"]:
-                    seats_query = Room.objects.filter(
-                        floor__class_name=class_name,
-                        floor__gender=gender
-                    ).aggregate(
-                        room_count=Count('id'),
-                        total_capacity=Sum('floor__block__per_room_capacity')
-                    )
-                    room_count = seats_query["room_count"] or 0
-                    total_capacity = seats_query["total_capacity"] or 0
-                    if room_count > 0 and total_capacity > 0:
-                        per_room_capacity = total_capacity // room_count
-                        total_seats = room_count * per_room_capacity
-                    else:
-                        total_seats = 0
-                    query = StudentDataEntry.objects.filter(
-                        class_name=class_name,
-                        gender=gender
-                    )
-                    registrations = query.count()
-                    verified = query.filter(verified=True).count()
-                    pending_verifications = query.filter(verified=None).count()
-                    if registrations > 0 and verified == 0:
-                        status_value = "registration"
-                    elif verified > 0 and pending_verifications > 0:
-                        status_value = "verification"
-                    elif verified > 0 and pending_verifications == 0 and verified < registrations:
-                        status_value = "selection"
-                    else:
-                        status_value = "completed"
-                    year_data[frontend_year_key][gender] = {
-                        "totalSeats": total_seats,
-                        "registrations": registrations,
-                        "verified": verified,
-                        "pendingVerifications": pending_verifications,
-                        "status": status_value,
-                    }
-                male_seats = year_data[frontend_year_key]["male"]["totalSeats"]
-                female_seats = year_data[frontend_year_key]["female"]["totalSeats"]
-                overall_stats["totalSeats"] += male_seats + female_seats
-            return Response(
-                {
-                    "yearData": year_data,
-                    "overallStats": overall_stats,
-                },
-                status=status.HTTP_200_OK,
-            )
+            return Response(cached_dashboard(), status=status.HTTP_200_OK)
         except Exception as e:
             return Response(
                 {"error": f"Failed to fetch dashboard data: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
-        
+
 class AllotRoomsView(APIView):
+    permission_classes = [IsAuthenticated, IsStaffUser]
+
     def post(self, request):
         # Extract year and gender from the request body
         year = request.data.get('year')
         gender = request.data.get('gender')
-
-        # Print the parameters to the console
-        print(f"Received Year: {year}")
-        print(f"Received Gender: {gender}")
+        logger.info(f"Room allotment requested for year {year}, gender {gender}")
 
         # Step 1: Convert the incoming year to the database format
         year_mapping = {
@@ -870,7 +859,7 @@ class AllotRoomsView(APIView):
             'third': 'ty',
             'fourth': 'btech'
         }
-        converted_year = year_mapping.get(year.lower())
+        converted_year = year_mapping.get(str(year).lower())
         if not converted_year:
             return Response(
                 {"error": f"Invalid year: {year}. Must be one of 'first', 'second', 'third', 'fourth'."},
@@ -884,131 +873,177 @@ class AllotRoomsView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        seed = request.data.get('seed')
+        if seed is not None:
+            try:
+                seed = int(seed)
+            except (TypeError, ValueError):
+                return Response(
+                    {"error": f"Invalid seed: {seed}. Must be an integer."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        strategy = request.data.get('strategy') or DEFAULT_STRATEGY
+        if strategy not in STRATEGIES:
+            return Response(
+                {"error": f"Invalid strategy: {strategy}. Must be one of: {', '.join(STRATEGIES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dry_run = is_true(request.data.get('dry_run'))
+        compare = is_true(request.data.get('compare'))
+        if is_background(request):
+            params = {"class_name": converted_year, "gender": gender, "seed": seed, "strategy": strategy}
+            if dry_run:
+                job = enqueue('simulate_allotment', {**params, "compare": compare}, user=request.user)
+            else:
+                job = enqueue('allot_rooms', params, user=request.user)
+            return job_accepted(request, job)
+
         try:
-            # Step 2: Filter RoomGroup by class_name and gender, then match with StudentDataEntry
-            room_groups = RoomGroup.objects.filter(class_name=converted_year, gender=gender)
-
-            # Initialize the array to store (mis, branch_id) tuples
-            current_year_toppers = []
-
-            # Iterate through each RoomGroup
-            for group in room_groups:
-                mis = group.name  # The 'mis' is the name field in RoomGroup
-                try:
-                    student = StudentDataEntry.objects.get(roll_no=mis)
-                    branch_id = student.branch.id  # Get the branch ID (ForeignKey ID)
-                    current_year_toppers.append((mis, branch_id))
-                except StudentDataEntry.DoesNotExist:
-                    print(f"No student found with roll_no (mis): {mis}")
-                    continue
-
-            # Step 3: Get the array of branch IDs for the corresponding year and initialize special branches
-
-
-            # we have to add the special branches like that 
-            # we have seat allocation weight in the branch i.e it will give us values like 2.00 , 0.50, 3.00 
-            #and we have to do like that if weight is 2 then two chances as we are giving right now if weight is 3 then threee consequetive chaneces if wiegt is half then 1 chance after 2 iterattions liek that 
-            current_year_branches = []
-            special_branches = set()  # Initialize set for special branches
-
-            branches = Branch.objects.filter(year=converted_year)
-            print(f"Found {branches.count()} branches for year {converted_year}")
-            for branch in branches:
-                branch_id = branch.id
-                current_year_branches.append(branch_id)
-                # Add to special_branches if seat_allocation_weight > 2
-                if branch.seat_allocation_weight > 1:
-                    special_branches.add(branch_id)
-
-
-            # Print for debugging
-            print("Current Year Branches:", current_year_branches)
-            print("Special Branches (COMPUTER, MECHANICAL) for year", converted_year, ":", special_branches)
-            print("Current Year Toppers:", current_year_toppers)
-
-            # Step 4: Create the 3D structure (branch_id -> mis -> preferences)
-            branch_mis_structure = {branch_id: [] for branch_id in current_year_branches}
-
-            # Step 5: Populate the structure with mis and empty preferences, and collect branch ranks
-            for branch_id in current_year_branches:
-                mis_for_branch = [(mis, branch_id) for mis, bid in current_year_toppers if bid == branch_id]
-                mis_with_ranks = []
-                for mis, _ in mis_for_branch:
-                    try:
-                        student = StudentDataEntry.objects.get(roll_no=mis)
-                        branch_rank = student.branch_rank if student.branch_rank is not None else float('inf')
-                        mis_with_ranks.append((mis, branch_rank))
-                    except StudentDataEntry.DoesNotExist:
-                        print(f"Student with roll_no {mis} not found during ranking")
-                        continue
-
-                # Sort mis values by branch_rank (lower ranks first)
-                mis_with_ranks.sort(key=lambda x: x[1])
-                for mis, _ in mis_with_ranks:
-                    branch_mis_structure[branch_id].append([mis, []])
-
-            # Step 6: Replace mis with group_id and fill room preferences
-            branch_group_structure = {branch_id: [] for branch_id in current_year_branches}
-            for branch_id, mis_list in branch_mis_structure.items():
-                for mis_entry in mis_list:
-                    mis = mis_entry[0]
-                    try:
-                        room_group = RoomGroup.objects.get(name=mis, class_name=converted_year, gender=gender)
-                        group_id = room_group.id
-                        preferences = Preference.objects.filter(room_group=room_group).order_by('rank')
-                        room_ids = [preference.room.id for preference in preferences]
-                        branch_group_structure[branch_id].append([group_id, room_ids])
-                    except RoomGroup.DoesNotExist:
-                        print(f"RoomGroup with name (mis) {mis} not found")
-                        continue
-
-            # Print the resulting structure for debugging
-            print("Branch Group Structure (with room preferences):", branch_group_structure)
+            # Dry run: compute the allotment and report the diff without writing
+            if dry_run:
+                result = simulate_allotment(
+                    converted_year, gender, seed=seed, strategy=strategy, compare=compare, inline=True
+                )
+                return Response(
+                    {
+                        "message": "Room allocation simulated, nothing was saved",
+                        **result,
+                    },
+                    status=status.HTTP_200_OK
+                )
 
-            
-            # Step 7: Allocate rooms
-            # Initialize pointers and shuffle branches
-            pointers = {branch_id: 0 for branch_id in current_year_branches}
-            random.shuffle(current_year_branches)
-            allocated_rooms = []
-
-            # Process allocations
-            while any(pointers[branch_id] < len(branch_group_structure.get(branch_id, []))
-                      for branch_id in current_year_branches):
-                for branch_id in current_year_branches:
-                    # Determine how many groups to process (2 for special branches, 1 for others)
-                    groups_to_process = 2 if branch_id in special_branches else 1
-                    groups_processed = 0
-
-                    while groups_processed < groups_to_process and pointers[branch_id] < len(branch_group_structure.get(branch_id, [])):
-                        group_entry = branch_group_structure[branch_id][pointers[branch_id]]
-                        group_id, room_preferences = group_entry
-
-                        for room_id in room_preferences:
-                            try:
-                                room = Room.objects.get(id=room_id)
-                                if not room.is_occupied:
-                                    group = RoomGroup.objects.get(id=group_id)
-                                    room.is_occupied = True
-                                    room.alloted_group = group
-                                    room.save()
-                                    allocated_rooms.append({
-                                        'group_id': group_id,
-                                        'room_id': room_id,
-                                        'room_number': room.room_id
-                                    })
-                                    pointers[branch_id] += 1
-                                    groups_processed += 1
-                                    break
-                            except Room.DoesNotExist:
-                                continue
-            print(allocated_rooms)
-            # Return the result
+            result = run_allotment(converted_year, gender, seed=seed, strategy=strategy, inline=True)
             return Response(
                 {
                     "message": "Room allocation completed successfully",
-                    "allocated_rooms": allocated_rooms,
-                    "branch_group_structure": branch_group_structure
+                    "seed": result["seed"],
+                    "strategy": result["strategy"],
+                    "allocated_rooms": result["allocated_rooms"],
+                    "waitlist": result["waitlist"],
+                },
+                status=status.HTTP_200_OK
+            )
+        except AllotmentTooLarge as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception:
+            logger.exception(f"Room allotment failed for {converted_year} {gender}")
+            return Response(
+                {"error": "Room allotment failed. The error has been logged."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class ReallotRoomsView(APIView):
+    """
+    Incremental re-allotment for one year and gender after rooms are freed or
+    groups change: only those groups and the waitlist are placed again.
+    """
+    permission_classes = [IsAuthenticated, IsStaffUser]
+
+    def post(self, request):
+        year = request.data.get('year')
+        gender = request.data.get('gender')
+
+        year_mapping = {
+            'first': 'fy',
+            'second': 'sy',
+            'third': 'ty',
+            'fourth': 'btech'
+        }
+        converted_year = year_mapping.get(str(year).lower())
+        if not converted_year:
+            return Response(
+                {"error": f"Invalid year: {year}. Must be one of 'first', 'second', 'third', 'fourth'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if gender not in ['male', 'female']:
+            return Response(
+                {"error": f"Invalid gender: {gender}. Must be 'male' or 'female'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            released_rooms = [int(room_id) for room_id in request.data.get('released_rooms') or []]
+            groups = [int(group_id) for group_id in request.data.get('groups') or []]
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "released_rooms and groups must be lists of ids."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        unknown_rooms = set(released_rooms) - set(
+            Room.objects.filter(
+                id__in=released_rooms, floor__class_name=converted_year, floor__gender=gender
+            ).values_list('id', flat=True)
+        )
+        unknown_groups = set(groups) - set(
+            RoomGroup.objects.filter(
+                id__in=groups, class_name=converted_year, gender=gender
+            ).values_list('id', flat=True)
+        )
+        if unknown_rooms or unknown_groups:
+            return Response(
+                {
+                    "error": f"Rooms or groups not found for {year} year and {gender} gender.",
+                    "unknown_rooms": sorted(unknown_rooms),
+                    "unknown_groups": sorted(unknown_groups),
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            dry_run = is_true(request.data.get('dry_run'))
+            result = run_reallotment(
+                converted_year, gender, released_rooms=released_rooms, groups=groups, dry_run=dry_run
+            )
+            return Response(
+                {
+                    "message": "Re-allocation simulated, nothing was saved" if dry_run else "Re-allocation completed successfully",
+                    **result,
+                },
+                status=status.HTTP_200_OK
+            )
+        except Exception:
+            logger.exception(f"Re-allotment failed for {converted_year} {gender}")
+            return Response(
+                {"error": "Re-allotment failed. The error has been logged."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class AllotAllRoomsView(APIView):
+    """Allot every year and gender in one run, the partitions in parallel."""
+    permission_classes = [IsAuthenticated, IsStaffUser]
+
+    def post(self, request):
+        seed = request.data.get('seed')
+        if seed is not None:
+            try:
+                seed = int(seed)
+            except (TypeError, ValueError):
+                return Response(
+                    {"error": f"Invalid seed: {seed}. Must be an integer."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        strategy = request.data.get('strategy') or DEFAULT_STRATEGY
+        if strategy not in STRATEGIES:
+            return Response(
+                {"error": f"Invalid strategy: {strategy}. Must be one of: {', '.join(STRATEGIES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if is_background(request):
+            job = enqueue('allot_all_rooms', {"seed": seed, "strategy": strategy}, user=request.user)
+            return job_accepted(request, job)
+
+        try:
+            result = allot_all(seed=seed, strategy=strategy, inline=True)
+            return Response(
+                {
+                    "message": f"Room allocation completed for {result['succeeded']} partitions, {result['failed']} failed",
+                    **result,
                 },
                 status=status.HTTP_200_OK
             )
@@ -1020,7 +1055,6 @@ class AllotRoomsView(APIView):
             )
 
 #-------------------PDF GENERATION UPDATED --------------------------#
-from django.http import HttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -1029,13 +1063,19 @@ from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.platypus import Table, TableStyle
-from io import BytesIO
 from datetime import datetime
 
 class GeneratePDFView(APIView):
+    def get(self, request):
+        # Same as POST, for clients that revalidate with If-None-Match / If-Modified-Since
+        return self.export(request, request.query_params)
+
     def post(self, request):
-        year = request.data.get("year")
-        gender = request.data.get("gender")
+        return self.export(request, request.data)
+
+    def export(self, request, params):
+        year = params.get("year")
+        gender = params.get("gender")
 
         # Map frontend year values to Floor.class_name
         year_mapping = {
@@ -1051,101 +1091,99 @@ class GeneratePDFView(APIView):
         if year not in year_mapping or gender not in ["male", "female"]:
             return Response({"error": "Invalid year or gender"}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            # Convert year to class_name
-            class_name = year_mapping[year]
-
-            # Initialize dictionary to group rooms by block
-            block_rooms = {}
-
-            # Fetch all occupied rooms
-            rooms = Room.objects.filter(
-                is_occupied=True,
-                alloted_group__isnull=False
-            ).select_related("floor__block")
-
-            # Group rooms by block for the given year and gender
-            for room in rooms:
-                floor = room.floor
-                if floor.class_name == class_name and floor.gender == gender:
-                    block_name = floor.block.name
-                    if block_name not in block_rooms:
-                        block_rooms[block_name] = []
-
-                    # Fetch roommate details for this room
-                    current_grp = room.alloted_group
-                    roommate_details = []
-
-                    if current_grp:
-                        # Get all CustomUser objects for the group
-                        roommate_users = current_grp.members.all()
-
-                        for user in roommate_users:
-                            # Check if the user has related student data
-                            if hasattr(user, 'data_entry') and user.data_entry:
-                                entry = user.data_entry
-                                full_name = f"{entry.first_name} {entry.middle_name or ''} {entry.last_name or ''}".strip()
-                                mobile_number = entry.mobile_number
-                                roommate_details.append({
-                                    'full_name': full_name,
-                                    'mobile_number': mobile_number
-                                })
-                            else:
-                                roommate_details.append({
-                                    'full_name': user.username,  # Fallback to username if no data_entry
-                                    'mobile_number': 'N/A'
-                                })
-                    else:
-                        roommate_details.append({
-                            'full_name': 'Not Allotted',
-                            'mobile_number': 'N/A'
-                        })
-
-                    # Store room with its roommate details
-                    block_rooms[block_name].append({
-                        'room_id': room.room_id,
-                        'roommates': roommate_details
-                    })
+        if is_background(request):
+            job = enqueue('allotment_pdf', {"year": year, "gender": gender}, user=request.user)
+            return job_accepted(request, job)
 
-            if not block_rooms:
-                # print("error not")
-                return Response({"error": "No rooms allotted for the selected year and gender"}, status=status.HTTP_404_NOT_FOUND)
-
-            # Create PDF with professional layout
-            buffer = BytesIO()
-            p = canvas.Canvas(buffer, pagesize=A4)
-            width, height = A4
-            margin = 0.8 * inch
-            y_position = height - margin
-
-            # Header Section
-            self._draw_header(p, width, y_position, year, gender)
-            y_position -= 1.5 * inch
-
-            # Generate tables for each block
-            for block_name, rooms in block_rooms.items():
-                y_position = self._draw_block_table(p, width, margin, y_position, block_name, rooms)
-                
-                # Check if we need a new page
-                if y_position < 2 * inch:
-                    p.showPage()
-                    y_position = height - margin
-
-            p.save()
-
-            # Get PDF data
-            pdf = buffer.getvalue()
-            buffer.close()
-
-            # Return PDF response
-            response = HttpResponse(content_type="application/pdf")
-            response["Content-Disposition"] = f'attachment; filename="COEP_Room_Allotment_{year}_{gender}_{datetime.now().year}.pdf"'
-            response.write(pdf)
-            return response
+        try:
+            # Reuse the stored PDF while neither the allotment nor the students changed
+            artifact = Artifact('generate_pdf', [year, gender], [STUDENTS_VERSION, ALLOTMENT_VERSION], 'pdf')
+            block_rooms = None
+            if artifact.mtime is None:
+                block_rooms = self.load_block_rooms(year_mapping[year], gender)
+
+                if not block_rooms:
+                    # print("error not")
+                    return Response({"error": "No rooms allotted for the selected year and gender"}, status=status.HTTP_404_NOT_FOUND)
+
+            return artifact.response(
+                request,
+                lambda stream: self.write_pdf(stream, block_rooms, year, gender),
+                self.pdf_filename(year, gender),
+                "application/pdf",
+            )
 
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @staticmethod
+    def pdf_filename(year, gender):
+        return f"COEP_Room_Allotment_{year}_{gender}_{datetime.now().year}.pdf"
+
+    def load_block_rooms(self, class_name, gender):
+        """Occupied rooms of one (year, gender) grouped by block, with roommate details"""
+        block_rooms = {}
+
+        # Filter in SQL and load every roommate up front: four queries however many rooms there are
+        entries = StudentDataEntry.objects.only('user', 'first_name', 'middle_name', 'last_name', 'mobile_number')
+        members = CustomUser.objects.only('id', 'username').prefetch_related(Prefetch('data_entry', queryset=entries))
+        rooms = Room.objects.filter(
+            is_occupied=True,
+            alloted_group__isnull=False,
+            floor__class_name=class_name,
+            floor__gender=gender,
+        ).select_related('floor__block').only(
+            'room_id', 'alloted_group', 'floor__block__name'
+        ).prefetch_related(Prefetch('alloted_group__members', queryset=members))
+
+        for room in rooms:
+            roommate_details = []
+            for user in room.alloted_group.members.all():
+                # Check if the user has related student data
+                entry = getattr(user, 'data_entry', None)
+                if entry:
+                    full_name = f"{entry.first_name} {entry.middle_name or ''} {entry.last_name or ''}".strip()
+                    roommate_details.append({
+                        'full_name': full_name,
+                        'mobile_number': entry.mobile_number
+                    })
+                else:
+                    roommate_details.append({
+                        'full_name': user.username,  # Fallback to username if no data_entry
+                        'mobile_number': 'N/A'
+                    })
+
+            # Store room with its roommate details
+            block_rooms.setdefault(room.floor.block.name, []).append({
+                'room_id': room.room_id,
+                'roommates': roommate_details
+            })
+
+        return block_rooms
+
+    def write_pdf(self, stream, block_rooms, year, gender):
+        """Render the allotment list for the given blocks into `stream`"""
+        # Create PDF with professional layout
+        p = canvas.Canvas(stream, pagesize=A4)
+        width, height = A4
+        margin = 0.8 * inch
+        y_position = height - margin
+
+        # Header Section
+        self._draw_header(p, width, y_position, year, gender)
+        y_position -= 1.5 * inch
+
+        # Generate tables for each block
+        for block_name, rooms in block_rooms.items():
+            y_position = self._draw_block_table(p, width, margin, y_position, block_name, rooms)
+            
+            # Check if we need a new page
+            if y_position < 2 * inch:
+                p.showPage()
+                y_position = height - margin
+
+        p.save()
+
     def _draw_header(self, p, width, y_position, year, gender):
         """Draw the official header section"""
         # Main title
@@ -1602,10 +1640,12 @@ class ResetAllotmentView(APIView):
 
         try:
             AllotmentHistory.objects.filter(year=converted_year, gender=gender).delete()
+            WaitlistEntry.objects.filter(class_name=converted_year, gender=gender).delete()
             Room.objects.filter(
                 alloted_group__class_name=converted_year,
                 alloted_group__gender=gender
             ).update(is_occupied=False, alloted_group=None)
+            rooms_changed.send(sender=Room, class_name=converted_year, gender=gender)
 
             return Response(
                 {"message": f"Allotment reset successfully for {year} year and {gender} gender."},
@@ -1665,6 +1705,27 @@ class ManualOverrideView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class JobStatusView(APIView):
+    permission_classes = [IsAuthenticated, IsStaffUser]
+
+    def get(self, request, job_id):
+        try:
+            job = Job.objects.get(id=job_id)
+        except Job.DoesNotExist:
+            return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(job_payload(job, request), status=status.HTTP_200_OK)
+
+class JobFileView(APIView):
+    """Download of a file produced by a job; only for the admin who queued it."""
+    permission_classes = [IsAuthenticated, IsStaffUser]
+
+    def get(self, request, job_id, token):
+        job = Job.objects.filter(id=job_id, created_by=request.user).first()
+        path = job_file(job, token) if job is not None else None
+        if path is None:
+            return Response({"error": "File not found."}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=job.result['filename'])
+
 class FetchBranchesView(APIView):
     permission_classes = [IsAuthenticated, IsManager]
 
@@ -1770,6 +1831,7 @@ class SelectStudentsAndRankView(APIView):
                 if students_to_update:
                     print(f"==> Step 3.1: Bulk updating {len(students_to_update)} students")
                     StudentDataEntry.objects.bulk_update(students_to_update, ['branch_rank'])
+                    branch_ranks_changed.send(sender=StudentDataEntry)
                 else:
                     print("==> Step 3.1: No rank changes detected")
             except Exception as e:
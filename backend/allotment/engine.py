@@ -0,0 +1,401 @@
+# allotment/engine.py
+import random
+import time
+import logging
+from django.db import connection, transaction
+from authentication.models import Branch
+from .models import RoomGroup, Room, Preference, WaitlistEntry
+from .signals import rooms_changed
+from .strategies import STRATEGIES, UNRANKED, PreferenceMatrix, check_inline_size, compare_strategies, get_strategy
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionSnapshot:
+    """In-memory view of one (class_name, gender) cohort used by the allotment."""
+
+    def __init__(self, class_name, gender, groups, branches, rooms):
+        self.class_name = class_name
+        self.gender = gender
+        # group_id -> {'id', 'name', 'branch_id', 'branch_rank', 'preferences': [room ids]}
+        self.groups = groups
+        # [(branch_id, seat_allocation_weight)] in a stable order
+        self.branches = branches
+        # room_id -> {'id', 'room_number', 'is_occupied', 'alloted_group_id'}
+        self.rooms = rooms
+
+
+def load_partition(class_name, gender, lock=False):
+    """
+    Load groups, member ranks, preferences, branches and rooms for one cohort.
+    Runs a fixed number of queries regardless of cohort size.
+    """
+    groups = {
+        group_id: {
+            'id': group_id,
+            'name': name,
+            'branch_id': None,
+            'branch_rank': None,
+            'preferences': [],
+        }
+        for group_id, name in RoomGroup.objects.filter(
+            class_name=class_name, gender=gender
+        ).values_list('id', 'name')
+    }
+
+    # The group is represented by the student whose roll_no is the group name,
+    # falling back to its best ranked member for groups named "Room-<username>".
+    members = RoomGroup.members.through.objects.filter(
+        roomgroup__class_name=class_name,
+        roomgroup__gender=gender,
+        customuser__data_entry__isnull=False,
+    ).values_list(
+        'roomgroup_id',
+        'customuser__data_entry__roll_no',
+        'customuser__data_entry__branch_id',
+        'customuser__data_entry__branch_rank',
+    )
+    leaders = {}
+    for group_id, roll_no, branch_id, branch_rank in members:
+        group = groups.get(group_id)
+        if group is None:
+            continue
+        rank = branch_rank if branch_rank is not None else UNRANKED
+        key = (roll_no != group['name'], rank)
+        if group_id not in leaders or key < leaders[group_id]:
+            leaders[group_id] = key
+            group['branch_id'] = branch_id
+            group['branch_rank'] = rank
+
+    preferences = Preference.objects.filter(
+        room_group__class_name=class_name,
+        room_group__gender=gender,
+    ).order_by('room_group_id', 'rank').values_list('room_group_id', 'room_id')
+    for group_id, room_id in preferences:
+        if group_id in groups:
+            groups[group_id]['preferences'].append(room_id)
+
+    branches = list(
+        Branch.objects.filter(year=class_name).order_by('id').values_list('id', 'seat_allocation_weight')
+    )
+
+    rooms_qs = Room.objects.filter(floor__class_name=class_name, floor__gender=gender)
+    if lock:
+        rooms_qs = rooms_qs.select_for_update()
+    rooms = {
+        room_id: {
+            'id': room_id,
+            'room_number': room_number,
+            'is_occupied': is_occupied,
+            'alloted_group_id': alloted_group_id,
+        }
+        for room_id, room_number, is_occupied, alloted_group_id in rooms_qs.values_list(
+            'id', 'room_id', 'is_occupied', 'alloted_group_id'
+        )
+    }
+
+    return PartitionSnapshot(class_name, gender, groups, branches, rooms)
+
+
+def allot(snapshot, seed=None, strategy=None, timings=None, inline=False):
+    """
+    Run an allotment strategy over the snapshot, entirely in memory.
+    Returns (assignments, unplaced) where assignments maps group_id -> room_id
+    and unplaced is the ranked waitlist of group ids. If a `timings` dict is
+    given, the cost of building the occupancy index is recorded in it.
+    With inline=True, runs too large for a web request raise AllotmentTooLarge.
+    """
+    matrix = PreferenceMatrix(snapshot)
+    if timings is not None:
+        timings['index_ms'] = matrix.occupancy.build_ms
+    strategy = get_strategy(strategy)
+    if inline:
+        check_inline_size(matrix, [strategy.name])
+    placed, unplaced = strategy.allot(matrix, seed=seed)
+    return matrix.to_ids(placed, unplaced)
+
+
+def changed_rooms(snapshot, assignments, released=()):
+    """
+    Rooms whose (is_occupied, alloted_group) differs from the snapshot once the
+    cohort's previous allotment is replaced by `assignments`. Rooms in
+    `released` are freed unless they were assigned again.
+    """
+    room_to_group = {room_id: group_id for group_id, room_id in assignments.items()}
+    changed = []
+    for room_id, room in snapshot.rooms.items():
+        if room_id in room_to_group:
+            target = (True, room_to_group[room_id])
+        elif room['alloted_group_id'] in snapshot.groups or room_id in released:
+            # Held by this cohort before but not part of the new allotment
+            target = (False, None)
+        else:
+            continue
+        if (room['is_occupied'], room['alloted_group_id']) != target:
+            changed.append(Room(id=room_id, is_occupied=target[0], alloted_group_id=target[1]))
+    return changed
+
+
+def elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def new_seed():
+    return random.SystemRandom().randrange(2 ** 31)
+
+
+def diff_allotment(snapshot, assignments, unplaced):
+    """
+    Compare a computed allotment against the rooms the cohort currently holds.
+    Returns moved, newly placed and unplaced groups plus an unchanged count.
+    """
+    current = current_assignments(snapshot)
+
+    def room_number(room_id):
+        return snapshot.rooms[room_id]['room_number'] if room_id is not None else None
+
+    moved, placed, unchanged = [], [], 0
+    for group_id, room_id in assignments.items():
+        previous = current.get(group_id)
+        if previous == room_id:
+            unchanged += 1
+        elif previous is None:
+            placed.append({'group_id': group_id, 'room_number': room_number(room_id)})
+        else:
+            moved.append({
+                'group_id': group_id,
+                'from_room': room_number(previous),
+                'to_room': room_number(room_id),
+            })
+
+    return {
+        'moved': moved,
+        'newly_placed': placed,
+        'unplaced': [
+            {'group_id': group_id, 'previous_room': room_number(current.get(group_id))}
+            for group_id in unplaced
+        ],
+        'unchanged': unchanged,
+    }
+
+
+def simulate_allotment(class_name, gender, seed=None, strategy=None, compare=False, inline=False):
+    """
+    Compute the allotment against a consistent snapshot without writing anything
+    and report how it differs from the current state. With compare=True every
+    strategy is also run on the same snapshot and measured. `inline` is as for allot().
+    """
+    strategy = get_strategy(strategy).name
+    seed = new_seed() if seed is None else seed
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        snapshot = load_partition(class_name, gender)
+
+    matrix = PreferenceMatrix(snapshot) if compare else None
+    if compare and inline:
+        check_inline_size(matrix, STRATEGIES)
+    assignments, unplaced = allot(snapshot, seed=seed, strategy=strategy, inline=inline)
+    result = {
+        'seed': seed,
+        'strategy': strategy,
+        'diff': diff_allotment(snapshot, assignments, unplaced),
+        'waitlist': waitlist_payload(snapshot, unplaced),
+        'rooms_to_write': len(changed_rooms(snapshot, assignments)),
+    }
+    if compare:
+        result['comparison'] = compare_strategies(matrix, seed=seed)
+    return result
+
+
+def run_allotment(class_name, gender, seed=None, strategy=None, inline=False):
+    """Load, allot and persist one cohort inside a single transaction. `inline` is as for allot()."""
+    strategy = get_strategy(strategy).name
+    seed = new_seed() if seed is None else seed
+    timings = {}
+    with transaction.atomic():
+        started = time.perf_counter()
+        snapshot = load_partition(class_name, gender, lock=True)
+        timings['load_ms'] = elapsed_ms(started)
+
+        started = time.perf_counter()
+        assignments, unplaced = allot(snapshot, seed=seed, strategy=strategy, timings=timings, inline=inline)
+        timings['allot_ms'] = elapsed_ms(started)
+
+        started = time.perf_counter()
+        rooms = changed_rooms(snapshot, assignments)
+        Room.objects.bulk_update(rooms, ['is_occupied', 'alloted_group'], batch_size=500)
+        rooms_changed.send(sender=Room, class_name=class_name, gender=gender)
+        save_waitlist(class_name, gender, unplaced)
+        timings['write_ms'] = elapsed_ms(started)
+
+    logger.info(
+        f"Allotted {len(assignments)} groups for {class_name} {gender}, "
+        f"{len(unplaced)} unplaced, {len(rooms)} rooms written"
+    )
+    return {
+        'seed': seed,
+        'strategy': strategy,
+        'allocated_rooms': [
+            {
+                'group_id': group_id,
+                'room_id': room_id,
+                'room_number': snapshot.rooms[room_id]['room_number'],
+            }
+            for group_id, room_id in assignments.items()
+        ],
+        'unplaced_groups': unplaced,
+        'waitlist': waitlist_payload(snapshot, unplaced),
+        'rooms_written': len(rooms),
+        'timings': timings,
+    }
+
+
+def current_assignments(snapshot):
+    """group_id -> room_id for the rooms this cohort holds right now."""
+    return {
+        room['alloted_group_id']: room_id
+        for room_id, room in snapshot.rooms.items()
+        if room['alloted_group_id'] in snapshot.groups
+    }
+
+
+def orphaned_rooms(snapshot):
+    """Rooms still marked occupied whose group has since been deleted."""
+    return {
+        room_id for room_id, room in snapshot.rooms.items()
+        if room['is_occupied'] and room['alloted_group_id'] is None
+    }
+
+
+def reallot(snapshot, waitlist, released_rooms=(), groups=(), timings=None):
+    """
+    Incremental re-allotment, entirely in memory.
+
+    Rooms in `released_rooms` are freed and whoever held them loses them; the
+    groups in `groups` give up their current room and are placed again. The
+    affected groups, the groups displaced from released rooms and the
+    waitlisted groups are then re-placed one at a time in rank order (the same
+    order serial dictatorship uses), each taking its best free room. A
+    displaced group never gets its released room back; if nothing else is
+    free it goes on the waitlist. Every other group keeps its room.
+
+    Returns (assignments, unplaced, released) like allot(), where released is
+    the set of rooms freed by the caller.
+    """
+    matrix = PreferenceMatrix(snapshot)
+    if timings is not None:
+        timings['index_ms'] = matrix.occupancy.build_ms
+    released = {room_id for room_id in released_rooms if room_id in snapshot.rooms}
+    affected = {group_id for group_id in groups if group_id in snapshot.groups}
+
+    previous = current_assignments(snapshot)
+    displaced = {
+        group_id: matrix.room_index[room_id]
+        for group_id, room_id in previous.items() if room_id in released
+    }
+    assignments = {
+        group_id: room_id
+        for group_id, room_id in previous.items()
+        if group_id not in affected and group_id not in displaced
+    }
+
+    taken = bytearray(matrix.blocked)
+    for room_id in released:
+        taken[matrix.room_index[room_id]] = 0
+    for room_id in assignments.values():
+        taken[matrix.room_index[room_id]] = 1
+
+    candidates = affected | set(displaced) | {group_id for group_id in waitlist if group_id in snapshot.groups}
+    candidates -= set(assignments)
+    unplaced = []
+    for group in matrix.global_order():
+        group_id = matrix.group_ids[group]
+        if group_id not in candidates:
+            continue
+        barred = displaced.get(group_id)
+        for room in matrix.row(group):
+            if not taken[room] and room != barred:
+                taken[room] = 1
+                assignments[group_id] = matrix.room_ids[room]
+                break
+        else:
+            unplaced.append(group_id)
+    return assignments, unplaced, released
+
+
+def run_reallotment(class_name, gender, released_rooms=(), groups=(), dry_run=False):
+    """
+    Re-place only the groups touched by freed rooms or changed groups, plus
+    the waitlist, and write just the rooms that change. Rooms left occupied by
+    deleted groups are freed as well.
+    """
+    timings = {}
+    with transaction.atomic():
+        started = time.perf_counter()
+        snapshot = load_partition(class_name, gender, lock=not dry_run)
+        waitlist = list(
+            WaitlistEntry.objects.filter(class_name=class_name, gender=gender)
+            .order_by('position').values_list('room_group_id', flat=True)
+        )
+        timings['load_ms'] = elapsed_ms(started)
+
+        started = time.perf_counter()
+        assignments, unplaced, released = reallot(
+            snapshot, waitlist, set(released_rooms) | orphaned_rooms(snapshot), groups, timings=timings
+        )
+        rooms = changed_rooms(snapshot, assignments, released)
+        timings['allot_ms'] = elapsed_ms(started)
+
+        if not dry_run:
+            started = time.perf_counter()
+            Room.objects.bulk_update(rooms, ['is_occupied', 'alloted_group'], batch_size=500)
+            rooms_changed.send(sender=Room, class_name=class_name, gender=gender)
+            if unplaced != waitlist:
+                save_waitlist(class_name, gender, unplaced)
+            timings['write_ms'] = elapsed_ms(started)
+
+    previous = current_assignments(snapshot)
+    logger.info(
+        f"Re-allotted {class_name} {gender}: {len(released)} rooms released, "
+        f"{len(rooms)} rooms {'to write' if dry_run else 'written'}"
+    )
+    return {
+        'diff': diff_allotment(snapshot, assignments, unplaced),
+        # Groups displaced from a released room that found no other; they are on the waitlist
+        'released_groups': [
+            group_id for group_id, room_id in previous.items()
+            if room_id in released and group_id not in assignments
+        ],
+        'waitlist': waitlist_payload(snapshot, unplaced),
+        'rooms_written': 0 if dry_run else len(rooms),
+        'rooms_to_write': len(rooms),
+        'timings': timings,
+    }
+
+
+def save_waitlist(class_name, gender, group_ids):
+    """Replace the cohort's waitlist with `group_ids` in ranked order."""
+    WaitlistEntry.objects.filter(class_name=class_name, gender=gender).delete()
+    WaitlistEntry.objects.bulk_create(
+        [
+            WaitlistEntry(room_group_id=group_id, class_name=class_name, gender=gender, position=position)
+            for position, group_id in enumerate(group_ids, 1)
+        ],
+        batch_size=500,
+    )
+
+
+def waitlist_payload(snapshot, group_ids):
+    waitlist = []
+    for position, group_id in enumerate(group_ids, 1):
+        group = snapshot.groups[group_id]
+        waitlist.append({
+            'position': position,
+            'group_id': group_id,
+            'group_name': group['name'],
+            'branch_id': group['branch_id'],
+            'branch_rank': group['branch_rank'] if group['branch_rank'] != UNRANKED else None,
+        })
+    return waitlist
@@ -0,0 +1,70 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from allotment.synthetic import clear_synthetic, generate_hostel
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic hostel (rooms, students, groups, preferences) for benchmarking"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', nargs='+', choices=['fy', 'sy', 'ty', 'btech'], help="Default: all years")
+        parser.add_argument('--genders', nargs='+', choices=['male', 'female'], help="Default: both")
+        parser.add_argument('--blocks', type=int, default=1, help="Blocks per year and gender")
+        parser.add_argument('--floors', type=int, default=2, help="Floors per block")
+        parser.add_argument('--rooms', type=int, default=20, help="Rooms per floor")
+        parser.add_argument('--capacity', type=int, default=2, help="Block per_room_capacity, also the group size")
+        parser.add_argument('--branches', type=int, default=5, help="Branches per year (max 10)")
+        parser.add_argument('--students-per-branch', type=int, default=40, help="Students per branch, year and gender")
+        parser.add_argument('--cgpa-mean', type=float, default=7.5)
+        parser.add_argument('--cgpa-sd', type=float, default=1.0)
+        parser.add_argument('--rank-spread', type=int, default=5,
+                            help="FY entrance ranks are drawn from 1 .. intake x rank-spread")
+        parser.add_argument('--jee-share', type=float, default=0.1, help="Share of FY students admitted via JEE")
+        parser.add_argument('--preferences', type=int, help="Rooms ranked per group (default: every room)")
+        parser.add_argument('--preference-skew', type=float, default=1.0,
+                            help="0 ranks rooms uniformly at random; higher values concentrate demand")
+        parser.add_argument('--verified', type=float, default=1.0, help="Share of students marked verified")
+        parser.add_argument('--unranked', action='store_true', help="Leave branch_rank empty")
+        parser.add_argument('--prefix', default='synth', help="Prefix for roll numbers, usernames and block names")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--clear', action='store_true', help="Delete earlier data with the same prefix first")
+
+    def handle(self, *args, **options):
+        if not 1 <= len(options['prefix']) <= 8:
+            raise CommandError("--prefix must be 1 to 8 characters (roll numbers are limited to 20)")
+        if not 1 <= options['branches'] <= 10:
+            raise CommandError("--branches must be between 1 and 10")
+        for name in ('blocks', 'floors', 'rooms', 'capacity', 'students_per_branch'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+
+        if options['clear']:
+            deleted = clear_synthetic(options['prefix'])
+            self.stdout.write(f"Cleared previous data: {deleted}")
+
+        stats = generate_hostel(
+            years=options['years'],
+            genders=options['genders'],
+            blocks=options['blocks'],
+            floors=options['floors'],
+            rooms=options['rooms'],
+            capacity=options['capacity'],
+            branches=options['branches'],
+            students_per_branch=options['students_per_branch'],
+            cgpa_mean=options['cgpa_mean'],
+            cgpa_sd=options['cgpa_sd'],
+            rank_spread=options['rank_spread'],
+            jee_share=options['jee_share'],
+            preferences=options['preferences'],
+            preference_skew=options['preference_skew'],
+            verified=options['verified'],
+            ranked=not options['unranked'],
+            prefix=options['prefix'],
+            seed=options['seed'],
+        )
+        # Students are bulk inserted, which bypasses the counter signals
+        call_command('reconcile_counters', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            "Generated {students} students ({verified} verified), {groups} groups, {rooms} rooms "
+            "and {preferences} preferences in {elapsed_seconds}s".format(**stats)
+        ))
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('allotment', '0010_room_alloted_group'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('class_name', models.CharField(choices=[('fy', 'First Year'), ('sy', 'Second Year'), ('ty', 'Third Year'), ('btech', 'Final Year')], max_length=10)),
+                ('gender', models.CharField(choices=[('male', 'Male'), ('female', 'Female')], max_length=10)),
+                ('position', models.PositiveIntegerField()),
+                ('room_group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entry', to='allotment.roomgroup')),
+            ],
+            options={
+                'ordering': ['class_name', 'gender', 'position'],
+                'indexes': [models.Index(fields=['class_name', 'gender', 'position'], name='allotment_w_class_n_43ea61_idx')],
+            },
+        ),
+    ]
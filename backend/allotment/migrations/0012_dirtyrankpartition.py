@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('allotment', '0011_waitlistentry'),
+        ('authentication', '0027_studentdataverification_backlogs_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyRankPartition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('class_name', models.CharField(choices=[('fy', 'First Year'), ('sy', 'Second Year'), ('ty', 'Third Year'), ('btech', 'Final Year')], max_length=10)),
+                ('gender', models.CharField(choices=[('male', 'Male'), ('female', 'Female')], max_length=10)),
+                ('marked_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dirty_rank_partitions', to='authentication.branch')),
+            ],
+            options={
+                'unique_together': {('class_name', 'branch', 'gender')},
+            },
+        ),
+    ]
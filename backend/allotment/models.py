@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from authentication.models import Branch
 
 User = get_user_model()
 
@@ -97,3 +98,30 @@ class Preference(models.Model):
 
     def __str__(self):
         return f"{self.room_group.name} - Room {self.room.room_id} (Rank {self.rank})"
+
+class WaitlistEntry(models.Model):
+    """A group that could not be placed by the last allotment run, in ranked order."""
+    room_group = models.OneToOneField(RoomGroup, on_delete=models.CASCADE, related_name='waitlist_entry')
+    class_name = models.CharField(max_length=10, choices=RoomGroup.CLASS_CHOICES)
+    gender = models.CharField(max_length=10, choices=RoomGroup.GENDER_CHOICES)
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['class_name', 'gender', 'position']
+        indexes = [models.Index(fields=['class_name', 'gender', 'position'])]
+
+    def __str__(self):
+        return f"{self.room_group.name} - Waitlist #{self.position} ({self.class_name}, {self.gender})"
+
+class DirtyRankPartition(models.Model):
+    """A (class_name, branch, gender) partition whose branch ranks need recomputing."""
+    class_name = models.CharField(max_length=10, choices=RoomGroup.CLASS_CHOICES)
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='dirty_rank_partitions')
+    gender = models.CharField(max_length=10, choices=RoomGroup.GENDER_CHOICES)
+    marked_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('class_name', 'branch', 'gender')
+
+    def __str__(self):
+        return f"{self.class_name} {self.branch_id} {self.gender} (dirty since {self.marked_at})"
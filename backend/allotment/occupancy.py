@@ -0,0 +1,94 @@
+# allotment/occupancy.py
+import time
+from array import array
+from .models import Room
+
+
+class OccupancyIndex:
+    """
+    Room occupancy of one (class_name, gender) partition, held in memory.
+
+    Rooms get dense indices 0..n-1 (in Room.id order); `bits` is a bytearray
+    with 1 for an occupied room, so "is this room free?" is a single byte
+    probe. `index_of` maps Room.id -> index and `room_ids` maps back.
+    `build_ms` records what it cost to build.
+    """
+
+    def __init__(self, class_name, gender, rows, held_free=()):
+        """
+        rows: (room id, room number, per_room_capacity, is_occupied, alloted_group_id).
+        Rooms held by a group in `held_free` are counted as free.
+        """
+        started = time.perf_counter()
+        self.class_name = class_name
+        self.gender = gender
+        self.room_ids = array('l')
+        self.room_numbers = []
+        self.bits = bytearray()
+        self.index_of = {}
+        self.number_index = {}
+        for room_id, room_number, capacity, is_occupied, alloted_group_id in sorted(rows):
+            index = len(self.room_ids)
+            self.index_of[room_id] = index
+            self.room_ids.append(room_id)
+            self.room_numbers.append(room_number)
+            self.bits.append(1 if is_occupied and alloted_group_id not in held_free else 0)
+            # Room numbers repeat across blocks, so rooms are looked up by number
+            # and capacity as the preference form does; a key still shared is ambiguous
+            key = (room_number, capacity)
+            self.number_index[key] = None if key in self.number_index else index
+        self.build_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    @classmethod
+    def load(cls, class_name, gender):
+        """Build the index for one partition with a single query."""
+        return cls.load_all(class_name=class_name, gender=gender).get(
+            (class_name, gender), cls(class_name, gender, [])
+        )
+
+    @classmethod
+    def load_all(cls, **filters):
+        """
+        Indexes for every partition that has rooms, keyed by (class_name,
+        gender), from one query. Filters use the floor's field names.
+        """
+        rows = {}
+        queryset = Room.objects.filter(**{f"floor__{key}": value for key, value in filters.items()})
+        for class_name, gender, *row in queryset.values_list(
+            'floor__class_name', 'floor__gender',
+            'id', 'room_id', 'floor__block__per_room_capacity', 'is_occupied', 'alloted_group_id',
+        ):
+            rows.setdefault((class_name, gender), []).append(row)
+        return {
+            (class_name, gender): cls(class_name, gender, partition_rows)
+            for (class_name, gender), partition_rows in rows.items()
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Index over an allotment snapshot without touching the database. Rooms
+        the cohort itself holds count as free, since a run places it again.
+        """
+        return cls(
+            snapshot.class_name,
+            snapshot.gender,
+            [
+                (room_id, room['room_number'], None, room['is_occupied'], room['alloted_group_id'])
+                for room_id, room in snapshot.rooms.items()
+            ],
+            held_free=snapshot.groups,
+        )
+
+    def __len__(self):
+        return len(self.bits)
+
+    def lookup_number(self, room_number, capacity):
+        """
+        Dense index of the room with this number in a block of this capacity,
+        or None if there is none or several.
+        """
+        return self.number_index.get((room_number, capacity))
+
+    def free_room_numbers(self):
+        return [number for number, bit in zip(self.room_numbers, self.bits) if not bit]
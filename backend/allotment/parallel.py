@@ -0,0 +1,126 @@
+# allotment/parallel.py
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import django
+from django.apps import apps
+from django.db import connection, connections
+from .engine import elapsed_ms, run_allotment
+from .models import RoomGroup
+from .strategies import get_strategy
+
+logger = logging.getLogger(__name__)
+
+# Floors, and therefore rooms, are split by (class_name, gender); the
+# partitions share no rows and can be allotted independently.
+PARTITIONS = [
+    (class_name, gender)
+    for class_name, _ in RoomGroup.CLASS_CHOICES
+    for gender, _ in RoomGroup.GENDER_CHOICES
+]
+
+
+def allot_partition(class_name, gender, seed=None, strategy=None, inline=False):
+    """Allot one partition and summarise the outcome; errors are reported, not raised."""
+    started = time.perf_counter()
+    outcome = {'class_name': class_name, 'gender': gender}
+    try:
+        result = run_allotment(class_name, gender, seed=seed, strategy=strategy, inline=inline)
+    except Exception as e:
+        logger.exception(f"Allotment failed for {class_name} {gender}")
+        outcome.update({'status': 'failed', 'error': str(e)})
+    else:
+        outcome.update({
+            'status': 'succeeded',
+            'seed': result['seed'],
+            'placed': len(result['allocated_rooms']),
+            'unplaced': len(result['unplaced_groups']),
+            'rooms_written': result['rooms_written'],
+            'timings': result['timings'],
+        })
+    outcome['elapsed_ms'] = elapsed_ms(started)
+    outcome['pid'] = os.getpid()
+    return outcome
+
+
+def _init_worker():
+    # Spawned workers start from a bare interpreter; forked ones inherit a ready Django
+    if not apps.ready:
+        django.setup()
+
+
+def _allot_partition_in_worker(class_name, gender, seed, strategy, inline):
+    try:
+        return allot_partition(class_name, gender, seed=seed, strategy=strategy, inline=inline)
+    finally:
+        # Worker processes are reused between partitions; don't keep idle connections
+        connections.close_all()
+
+
+def allot_all(seed=None, strategy=None, workers=None, on_result=None, inline=False):
+    """
+    Allot every (class_name, gender) partition, running them concurrently in a
+    process pool. Each worker opens its own connection and allots its partition
+    in its own transaction, so a failure rolls back only that partition.
+    Partitions without any room groups are skipped.
+
+    on_result(outcome, done, total) is called in the parent as each partition
+    finishes. Returns a summary with per-partition outcomes in PARTITIONS order.
+    With inline=True, partitions too large for a web request fail with AllotmentTooLarge.
+    """
+    if connection.in_atomic_block:
+        raise RuntimeError("allot_all() must not be called inside a transaction")
+
+    strategy = get_strategy(strategy).name
+    started = time.perf_counter()
+    active = set(RoomGroup.objects.values_list('class_name', 'gender').distinct())
+    pending = [partition for partition in PARTITIONS if partition in active]
+    outcomes = {
+        partition: {'class_name': partition[0], 'gender': partition[1], 'status': 'skipped'}
+        for partition in PARTITIONS if partition not in active
+    }
+
+    if workers is None:
+        workers = min(len(pending), os.cpu_count() or 1)
+    if connection.vendor == 'sqlite':
+        # SQLite has a single writer; extra processes would only queue on the file lock
+        workers = 1
+
+    finished = []
+
+    def collect(outcome):
+        outcomes[(outcome['class_name'], outcome['gender'])] = outcome
+        finished.append(outcome)
+        if on_result is not None:
+            on_result(outcome, len(finished), len(pending))
+
+    if workers <= 1:
+        for class_name, gender in pending:
+            collect(allot_partition(class_name, gender, seed=seed, strategy=strategy, inline=inline))
+    else:
+        # Forked children must not share the parent's open database sockets
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [
+                pool.submit(_allot_partition_in_worker, class_name, gender, seed, strategy, inline)
+                for class_name, gender in pending
+            ]
+            for future in as_completed(futures):
+                collect(future.result())
+
+    partitions = [outcomes[partition] for partition in PARTITIONS]
+    summary = {
+        'strategy': strategy,
+        'workers': workers,
+        'elapsed_ms': elapsed_ms(started),
+        'succeeded': sum(1 for outcome in partitions if outcome['status'] == 'succeeded'),
+        'failed': sum(1 for outcome in partitions if outcome['status'] == 'failed'),
+        'skipped': sum(1 for outcome in partitions if outcome['status'] == 'skipped'),
+        'partitions': partitions,
+    }
+    logger.info(
+        f"Allotted {summary['succeeded']} partitions ({summary['failed']} failed) "
+        f"with {workers} workers in {summary['elapsed_ms']} ms"
+    )
+    return summary
@@ -0,0 +1,189 @@
+# allotment/ranking.py
+import logging
+import math
+from django.db import connection, transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import Rank
+from django.dispatch import Signal
+from authentication.models import StudentDataEntry
+from .models import DirtyRankPartition
+
+logger = logging.getLogger(__name__)
+
+# Years ranked within their branch by CGPA; FY is ranked by entrance exam rank
+CGPA_RANKED_YEARS = ['sy', 'ty', 'btech']
+BATCH_SIZE = 1000
+# StudentDataEntry fields that decide where a student ranks within its branch
+RANK_FIELDS = ('class_name', 'branch_id', 'gender', 'cgpa', 'rank', 'entrance_exam', 'verified')
+
+# Sent after branch_rank is written in bulk (no per-student post_save)
+branch_ranks_changed = Signal()
+
+
+def partitions_filter(partitions):
+    """Q matching the students of the given (class_name, branch_id, gender) partitions."""
+    condition = Q(pk__in=[])
+    for class_name, branch_id, gender in partitions:
+        condition |= Q(class_name=class_name, branch_id=branch_id, gender=gender)
+    return condition
+
+
+def write_branch_ranks(changed):
+    """
+    Store branch_rank for StudentDataEntry(roll_no, branch_rank) instances.
+    On Postgres and SQLite each batch is one UPDATE ... FROM (VALUES ...)
+    join; bulk_update's per-row CASE expressions cost far more to build.
+    """
+    if not changed:
+        return
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        StudentDataEntry.objects.bulk_update(changed, ['branch_rank'], batch_size=BATCH_SIZE)
+        branch_ranks_changed.send(sender=StudentDataEntry)
+        return
+
+    table = connection.ops.quote_name(StudentDataEntry._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(changed), BATCH_SIZE):
+            batch = changed[start:start + BATCH_SIZE]
+            values = ', '.join(['(%s, %s)'] * len(batch))
+            params = [value for student in batch for value in (student.roll_no, student.branch_rank)]
+            cursor.execute(
+                f"UPDATE {table} SET branch_rank = v.column2 FROM (VALUES {values}) AS v "
+                f"WHERE {table}.roll_no = v.column1",
+                params,
+            )
+    branch_ranks_changed.send(sender=StudentDataEntry)
+
+
+def cgpa_rank_changes(class_names=CGPA_RANKED_YEARS, partitions=None, **filters):
+    """
+    Students whose branch_rank differs from
+    RANK() OVER (PARTITION BY class_name, branch_id, gender ORDER BY cgpa DESC NULLS LAST),
+    computed by the database in a single query, optionally limited to whole
+    (class_name, branch_id, gender) partitions. Returns unsaved
+    StudentDataEntry(roll_no, branch_rank) instances for write_branch_ranks().
+    """
+    students = StudentDataEntry.objects.filter(class_name__in=class_names, **filters)
+    if partitions is not None:
+        students = students.filter(partitions_filter(partitions))
+    ranked = students.annotate(
+        new_rank=Window(
+            expression=Rank(),
+            partition_by=[F('class_name'), F('branch_id'), F('gender')],
+            order_by=F('cgpa').desc(nulls_last=True),
+        )
+    ).values_list('roll_no', 'branch_rank', 'new_rank')
+    return [
+        StudentDataEntry(roll_no=roll_no, branch_rank=new_rank)
+        for roll_no, branch_rank, new_rank in ranked.iterator(chunk_size=2000)
+        if branch_rank != new_rank
+    ]
+
+
+def assign_cgpa_branch_ranks(class_names=CGPA_RANKED_YEARS, partitions=None, **filters):
+    """
+    Recompute CGPA based branch ranks and write only the rows that changed:
+    one SELECT plus one UPDATE per BATCH_SIZE changed students, however many
+    branches there are. Returns the number of students updated.
+    """
+    with transaction.atomic():
+        changed = cgpa_rank_changes(class_names, partitions, **filters)
+        write_branch_ranks(changed)
+    logger.info(f"Updated branch ranks of {len(changed)} {'/'.join(class_names)} students")
+    return len(changed)
+
+
+def interleaved_position(index, exam, cet_count, jee_count):
+    """
+    0-based branch position of the index-th CET or JEE student once the two
+    merit lists are interleaved: blocks of ceil(cet/jee) CET students then one
+    JEE student, with whichever list is left over appended at the end.
+    """
+    if jee_count == 0:
+        return index
+    interval = math.ceil(cet_count / jee_count)
+    if exam == 'mht_cet':
+        # JEE students placed before it: one per completed CET block
+        return index + min(index // interval, jee_count)
+    # CET students placed before it: its own block and all earlier ones
+    return index + min((index + 1) * interval, cet_count)
+
+
+def fy_rank_changes(partitions=None, **filters):
+    """
+    FY students whose branch_rank differs from the CET/JEE interleaved order,
+    for every FY branch and gender from one ordered query. Each position is
+    computed directly from the student's place in its exam's merit list.
+    Students with no entrance exam are left alone.
+    """
+    students = StudentDataEntry.objects.filter(
+        class_name='fy', entrance_exam__in=['mht_cet', 'jee_mains'], **filters
+    )
+    if partitions is not None:
+        students = students.filter(partitions_filter(partitions))
+    students = students.order_by(
+        'branch_id', 'gender', 'entrance_exam', F('rank').asc(nulls_last=True), 'roll_no'
+    ).values_list('roll_no', 'branch_id', 'gender', 'entrance_exam', 'branch_rank')
+
+    # (branch_id, gender) -> exam -> [(roll_no, branch_rank)] in merit order
+    merit_lists = {}
+    for roll_no, branch_id, gender, exam, branch_rank in students.iterator(chunk_size=2000):
+        merit_lists.setdefault((branch_id, gender), {}).setdefault(exam, []).append((roll_no, branch_rank))
+
+    changed = []
+    for lists in merit_lists.values():
+        cet_count = len(lists.get('mht_cet', ()))
+        jee_count = len(lists.get('jee_mains', ()))
+        for exam, merit_list in lists.items():
+            for index, (roll_no, branch_rank) in enumerate(merit_list):
+                new_rank = interleaved_position(index, exam, cet_count, jee_count) + 1
+                if branch_rank != new_rank:
+                    changed.append(StudentDataEntry(roll_no=roll_no, branch_rank=new_rank))
+    return changed
+
+
+def assign_fy_branch_ranks(partitions=None, **filters):
+    """Recompute FY branch ranks and write only the rows that changed. Returns the number updated."""
+    with transaction.atomic():
+        changed = fy_rank_changes(partitions, **filters)
+        write_branch_ranks(changed)
+    logger.info(f"Updated branch ranks of {len(changed)} fy students")
+    return len(changed)
+
+
+def mark_partitions_dirty(partitions):
+    """Queue (class_name, branch_id, gender) partitions for rerank_dirty_partitions()."""
+    DirtyRankPartition.objects.bulk_create(
+        [
+            DirtyRankPartition(class_name=class_name, branch_id=branch_id, gender=gender)
+            for class_name, branch_id, gender in partitions
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def rerank_dirty_partitions():
+    """
+    Re-rank only the partitions marked dirty, writing only students whose rank
+    moved. Dirty rows are claimed with SKIP LOCKED so concurrent callers never
+    rank the same partition twice. Returns the number of students updated.
+    """
+    with transaction.atomic():
+        dirty = list(
+            DirtyRankPartition.objects.select_for_update(skip_locked=True)
+            .values_list('id', 'class_name', 'branch_id', 'gender')
+        )
+        if not dirty:
+            return 0
+        DirtyRankPartition.objects.filter(id__in=[row[0] for row in dirty]).delete()
+
+        partitions = [row[1:] for row in dirty]
+        cgpa_partitions = [p for p in partitions if p[0] in CGPA_RANKED_YEARS]
+        fy_partitions = [p for p in partitions if p[0] == 'fy']
+        updated = 0
+        if cgpa_partitions:
+            updated += assign_cgpa_branch_ranks(partitions=cgpa_partitions)
+        if fy_partitions:
+            updated += assign_fy_branch_ranks(partitions=fy_partitions)
+    logger.info(f"Re-ranked {len(partitions)} dirty partitions, {updated} students moved")
+    return updated
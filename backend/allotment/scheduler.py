@@ -0,0 +1,48 @@
+# allotment/scheduler.py
+from decimal import Decimal
+
+# Branch.seat_allocation_weight has two decimal places, so credits are kept in
+# hundredths of a turn and the arithmetic stays exact.
+SCALE = 100
+
+
+def weight_units(weight):
+    """Weight in hundredths of a turn; missing or non-positive weights count as 1.0."""
+    if weight is None or weight <= 0:
+        return SCALE
+    return max(1, int((Decimal(str(weight)) * SCALE).to_integral_value()))
+
+
+def weighted_turns(branches, demand):
+    """
+    Yield branch ids in the order they take turns.
+
+    `branches` is [(branch_id, seat_allocation_weight)] in round order and
+    `demand` maps branch_id -> number of groups waiting. Each round every branch
+    earns its weight in credit and takes one consecutive turn per whole credit,
+    so a weight of 2.0 gets two turns a round, 3.0 three, and 0.5 one turn every
+    second round. A branch leaves the rotation once its demand is met, and
+    rounds in which nobody would reach a whole turn are skipped, so the
+    generator yields exactly sum(demand) turns.
+    """
+    active = [
+        [branch_id, weight_units(weight), 0, demand.get(branch_id, 0)]
+        for branch_id, weight in branches
+        if demand.get(branch_id, 0) > 0
+    ]
+
+    while active:
+        # Rounds until the first branch reaches a whole turn (ceil division)
+        rounds = min(-(-(SCALE - credit) // units) for _, units, credit, _ in active)
+        for entry in active:
+            entry[2] += entry[1] * rounds
+            while entry[2] >= SCALE and entry[3] > 0:
+                entry[2] -= SCALE
+                entry[3] -= 1
+                yield entry[0]
+        active = [entry for entry in active if entry[3] > 0]
+
+
+def turn_sequence(branches, demand):
+    """The full turn order as a list, see weighted_turns."""
+    return list(weighted_turns(branches, demand))
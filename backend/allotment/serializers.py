@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from authentication.models import StudentDataEntry
 from .models import *
+from .occupancy import OccupancyIndex
 
 User = get_user_model()
 
@@ -123,17 +124,13 @@ class PreferenceSubmitSerializer(serializers.Serializer):
             # Access student data via related_name
             student_data = request.user.data_entry
 
-            # Fetch floors that match student class and gender
-            floors = Floor.objects.filter(
-                class_name=student_data.class_name,
-                gender=student_data.gender
-            )
-
-            # Fetch rooms on those floors which are not occupied
-            room_ids = Room.objects.filter(
-                floor__in=floors,
-                is_occupied=False
-            ).values_list('room_id', flat=True)
+            # Free rooms of the student's class and gender, from the occupancy index;
+            # an index over a partition without rooms is falsy (__len__ counts its
+            # rooms), so test for None
+            occupancy = self.context.get('occupancy')
+            if occupancy is None:
+                occupancy = OccupancyIndex.load(student_data.class_name, student_data.gender)
+            room_ids = occupancy.free_room_numbers()
 
             if sorted(value) != sorted(room_ids):
                 raise serializers.ValidationError(
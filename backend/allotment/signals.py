@@ -0,0 +1,64 @@
+# allotment/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import Signal, receiver
+from authentication.models import StudentDataEntry
+from .ranking import RANK_FIELDS, mark_partitions_dirty, rerank_dirty_partitions
+
+# Sent after room occupancy is written in bulk (no per-room post_save), with
+# the class_name and gender of the rooms
+rooms_changed = Signal()
+
+
+def rank_state(instance):
+    # Read the instance dict directly so deferred fields are never loaded
+    return tuple(instance.__dict__.get(field) for field in RANK_FIELDS)
+
+
+def rank_partition(state):
+    class_name, branch_id, gender = state[:3]
+    if class_name and branch_id is not None and gender:
+        return class_name, branch_id, gender
+    return None
+
+
+def queue_rerank(states, instance=None):
+    """
+    Mark the partitions of `states` dirty and re-rank them once the transaction
+    commits. The saved `instance` gets its new branch_rank back, so saving it
+    again does not write the stale value over the re-ranked one.
+    """
+    partitions = {rank_partition(state) for state in states} - {None}
+    if not partitions:
+        return
+    mark_partitions_dirty(partitions)
+
+    def rerank():
+        # Repeated callbacks in one transaction find nothing left to do after the first
+        rerank_dirty_partitions()
+        if instance is not None:
+            instance.refresh_from_db(fields=['branch_rank'])
+
+    transaction.on_commit(rerank, robust=True)
+
+
+@receiver(post_init, sender=StudentDataEntry)
+def remember_rank_state(sender, instance, **kwargs):
+    instance._rank_state = rank_state(instance)
+
+
+@receiver(post_save, sender=StudentDataEntry)
+def rerank_on_save(sender, instance, created, **kwargs):
+    old = getattr(instance, '_rank_state', None)
+    new = rank_state(instance)
+    instance._rank_state = new
+    if created or old is None:
+        queue_rerank([new], instance)
+    elif old != new:
+        # A branch, year or gender change leaves a gap in the old partition too
+        queue_rerank([old, new], instance)
+
+
+@receiver(post_delete, sender=StudentDataEntry)
+def rerank_on_delete(sender, instance, **kwargs):
+    queue_rerank([rank_state(instance)])
@@ -0,0 +1,305 @@
+# allotment/strategies.py
+import heapq
+import random
+import time
+from array import array
+from .occupancy import OccupancyIndex
+from .scheduler import weighted_turns
+
+UNRANKED = float('inf')
+# min_cost runs one Dijkstra pass per group, so its cost grows with groups x
+# preference edges. Measured on synthetic cohorts it takes 5-25 ns per unit, the
+# slow end when rooms are scarce; 80M units stay around 2s inside a web request.
+INLINE_MAX_WORK = 80_000_000
+
+
+class AllotmentTooLarge(ValueError):
+    """The run would take too long for a web request; it should go to the job worker."""
+
+
+class PreferenceMatrix:
+    """
+    Array form of a cohort's preferences, indexed densely by group and room.
+    Row g of the matrix is indices[indptr[g]:indptr[g + 1]], the room indices
+    group g listed in rank order (CSR layout).
+    """
+
+    def __init__(self, snapshot):
+        # Rooms are indexed by the partition's occupancy index; `blocked` marks
+        # rooms held by someone outside the cohort.
+        self.occupancy = OccupancyIndex.from_snapshot(snapshot)
+        self.room_ids = self.occupancy.room_ids
+        self.room_index = self.occupancy.index_of
+        self.blocked = self.occupancy.bits
+        self.group_ids = sorted(snapshot.groups)
+        self.branch_of = []
+        self.rank_of = []
+        self.indptr = array('l', [0])
+        self.indices = array('l')
+        for group_id in self.group_ids:
+            group = snapshot.groups[group_id]
+            self.branch_of.append(group['branch_id'])
+            self.rank_of.append(group['branch_rank'] if group['branch_rank'] is not None else UNRANKED)
+            self.indices.extend(
+                self.room_index[room_id] for room_id in group['preferences'] if room_id in self.room_index
+            )
+            self.indptr.append(len(self.indices))
+
+        self.branches = list(snapshot.branches)
+
+    @property
+    def group_count(self):
+        return len(self.group_ids)
+
+    def row(self, group):
+        return self.indices[self.indptr[group]:self.indptr[group + 1]]
+
+    def branch_queues(self):
+        """branch_id -> group indices ordered by branch rank, for the branches of this year."""
+        queues = {branch_id: [] for branch_id, _ in self.branches}
+        for group in range(self.group_count):
+            if self.branch_of[group] in queues:
+                queues[self.branch_of[group]].append(group)
+        for queue in queues.values():
+            queue.sort(key=lambda g: (self.rank_of[g], self.group_ids[g]))
+        return queues
+
+    def global_order(self):
+        """
+        All groups ordered by branch rank normalised to the branch size, so the
+        top student of a small branch sits level with the top of a large one.
+        """
+        sizes = {}
+        for branch_id in self.branch_of:
+            sizes[branch_id] = sizes.get(branch_id, 0) + 1
+        return sorted(
+            range(self.group_count),
+            key=lambda g: (self.rank_of[g] / sizes[self.branch_of[g]], self.rank_of[g], self.group_ids[g]),
+        )
+
+    def to_ids(self, placed, unplaced):
+        """Translate (group index -> room index, [group index]) back to database ids."""
+        assignments = {self.group_ids[g]: self.room_ids[r] for g, r in placed.items()}
+        return assignments, [self.group_ids[g] for g in unplaced]
+
+
+class AllotmentStrategy:
+    """
+    Base class for allotment algorithms. allot() takes a PreferenceMatrix and
+    returns (placed, unplaced): a dict of group index -> room index and the
+    ranked waitlist of group indices.
+    """
+    name = None
+    label = None
+
+    def allot(self, matrix, seed=None):
+        raise NotImplementedError
+
+
+class BranchRoundRobin(AllotmentStrategy):
+    """Branches take weighted turns; each turn places the branch's best remaining group."""
+    name = 'branch_round_robin'
+    label = 'Branch round-robin'
+
+    def allot(self, matrix, seed=None):
+        queues = matrix.branch_queues()
+        order = list(matrix.branches)
+        random.Random(seed).shuffle(order)
+        demand = {branch_id: len(queue) for branch_id, queue in queues.items()}
+
+        taken = bytearray(matrix.blocked)
+        placed = {}
+        unplaced = []
+        pointers = {branch_id: 0 for branch_id in queues}
+
+        # The scheduler yields exactly one turn per queued group and every group
+        # is dequeued once whether or not it gets a room, so a run is bounded by
+        # O(groups x preferences).
+        for branch_id in weighted_turns(order, demand):
+            group = queues[branch_id][pointers[branch_id]]
+            pointers[branch_id] += 1
+            for room in matrix.row(group):
+                if not taken[room]:
+                    taken[room] = 1
+                    placed[group] = room
+                    break
+            else:
+                unplaced.append(group)
+
+        # Groups without a branch of this year never get a turn; they rank last.
+        unplaced.extend(g for g in range(matrix.group_count) if matrix.branch_of[g] not in queues)
+        return placed, unplaced
+
+
+class SerialDictatorship(AllotmentStrategy):
+    """Groups pick in one global rank order, each taking its best free room."""
+    name = 'serial_dictatorship'
+    label = 'Serial dictatorship by rank'
+
+    def allot(self, matrix, seed=None):
+        taken = bytearray(matrix.blocked)
+        placed = {}
+        unplaced = []
+        for group in matrix.global_order():
+            for room in matrix.row(group):
+                if not taken[room]:
+                    taken[room] = 1
+                    placed[group] = room
+                    break
+            else:
+                unplaced.append(group)
+        return placed, unplaced
+
+
+class MinCostAssignment(AllotmentStrategy):
+    """
+    Places as many groups as possible while minimising the sum of the preference
+    ranks they receive. Successive shortest augmenting paths (Dijkstra with
+    potentials) over the sparse preference graph, so only listed rooms are
+    ever considered. Each group also has a private "unplaced" column whose
+    cost exceeds any achievable rank sum, which lets a later group displace an
+    earlier one whenever that lowers the total without placing fewer groups.
+
+    Each group keeps only its first group_count free rooms: with fewer than
+    group_count other groups, one of those is always still open, so a room
+    further down the list can never be part of an optimal allotment.
+    """
+    name = 'min_cost'
+    label = 'Minimum total preference rank'
+
+    @staticmethod
+    def group_edges(matrix):
+        """Per group, the (rank cost, room) edges left after pruning."""
+        group_edges = []
+        for group in range(matrix.group_count):
+            edges = [(cost, room) for cost, room in enumerate(matrix.row(group)) if not matrix.blocked[room]]
+            group_edges.append(edges[:matrix.group_count])
+        return group_edges
+
+    def allot(self, matrix, seed=None):
+        room_count = len(matrix.room_ids)
+        group_count = matrix.group_count
+        group_edges = self.group_edges(matrix)
+        longest = max((edges[-1][0] + 1 for edges in group_edges if edges), default=0)
+        unplaced_cost = longest * group_count + 1
+        for group, edges in enumerate(group_edges):
+            edges.append((unplaced_cost, room_count + group))
+
+        # Columns are the real rooms followed by one unplaced column per group
+        group_pot = [0] * group_count
+        column_pot = [0] * (room_count + group_count)
+        column_owner = [-1] * (room_count + group_count)
+        group_column = {}
+
+        for source in matrix.global_order():
+            # Dijkstra over reduced costs cost - group_pot - column_pot, entering
+            # a taken room's owner through its zero-cost matched edge.
+            dist = {}
+            via = {}
+            done_groups = {source: 0}
+            done_columns = {}
+            heap = []
+            target = None
+
+            def relax(group, base):
+                for cost, column in group_edges[group]:
+                    if column in done_columns:
+                        continue
+                    d = base + cost - group_pot[group] - column_pot[column]
+                    if d < dist.get(column, UNRANKED):
+                        dist[column] = d
+                        via[column] = group
+                        heapq.heappush(heap, (d, column))
+
+            relax(source, 0)
+            while heap:
+                d, column = heapq.heappop(heap)
+                if column in done_columns or d > dist[column]:
+                    continue
+                done_columns[column] = d
+                owner = column_owner[column]
+                if owner == -1:
+                    target = column
+                    break
+                done_groups[owner] = d
+                relax(owner, d)
+
+            # Keep reduced costs non-negative and matched edges tight
+            total = done_columns[target]
+            for group, d in done_groups.items():
+                group_pot[group] += total - d
+            for column, d in done_columns.items():
+                column_pot[column] -= total - d
+
+            column = target
+            while True:
+                group = via[column]
+                previous = group_column.get(group)
+                group_column[group] = column
+                column_owner[column] = group
+                if group == source:
+                    break
+                column = previous
+
+        placed = {group: column for group, column in group_column.items() if column < room_count}
+        unplaced = [group for group in matrix.global_order() if group not in placed]
+        return placed, unplaced
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (BranchRoundRobin(), SerialDictatorship(), MinCostAssignment())
+}
+DEFAULT_STRATEGY = BranchRoundRobin.name
+
+
+def get_strategy(name):
+    try:
+        return STRATEGIES[name or DEFAULT_STRATEGY]
+    except KeyError:
+        raise ValueError(f"Unknown allotment strategy: {name}. Must be one of: {', '.join(STRATEGIES)}")
+
+
+def check_inline_size(matrix, strategies, max_work=INLINE_MAX_WORK):
+    """
+    Raise AllotmentTooLarge if min_cost is among `strategies` and groups x
+    preference edges exceeds max_work.
+    """
+    if MinCostAssignment.name not in strategies:
+        return
+    edges = sum(len(edges) for edges in MinCostAssignment.group_edges(matrix))
+    if matrix.group_count * edges > max_work:
+        raise AllotmentTooLarge(
+            f"{MinCostAssignment.name} over {matrix.group_count} groups and {edges} preference edges "
+            f"is too large to run in a request; pass background=true"
+        )
+
+
+def satisfaction(matrix, placed):
+    """Summary of how well a result honours preferences (ranks are 1-based)."""
+    ranks = []
+    for group, room in placed.items():
+        ranks.append(list(matrix.row(group)).index(room) + 1)
+    return {
+        'placed': len(ranks),
+        'unplaced': matrix.group_count - len(ranks),
+        'total_rank': sum(ranks),
+        'mean_rank': round(sum(ranks) / len(ranks), 3) if ranks else None,
+        'first_choice': ranks.count(1),
+    }
+
+
+def compare_strategies(matrix, seed=None):
+    """Run every strategy on the same matrix and report runtime and satisfaction."""
+    report = []
+    for strategy in STRATEGIES.values():
+        started = time.perf_counter()
+        placed, _ = strategy.allot(matrix, seed=seed)
+        elapsed = time.perf_counter() - started
+        report.append({
+            'strategy': strategy.name,
+            'label': strategy.label,
+            'runtime_ms': round(elapsed * 1000, 2),
+            **satisfaction(matrix, placed),
+        })
+    return report
@@ -0,0 +1,261 @@
+# allotment/synthetic.py
+# Synthetic hostel data for benchmarks and local load testing
+import math
+import random
+import time
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from authentication.models import (
+    AdmissionCategory, Branch, Caste, CustomUser, StudentDataEntry, StudentDataVerification
+)
+from .models import Block, Floor, Room, RoomGroup, Preference
+from .ranking import CGPA_RANKED_YEARS, assign_cgpa_branch_ranks, assign_fy_branch_ranks
+
+BRANCH_NAMES = [
+    'Computer', 'ENTC', 'Electrical', 'Mechanical', 'Civil',
+    'Instrumentation', 'Metallurgy', 'Production', 'Manufacturing', 'Planning',
+]
+# (caste, share of students in percent); also used as the seat matrix percentage, so the shares sum to 100
+CASTES = [('OPEN', 40), ('OBC', 27), ('SC', 13), ('NT', 8), ('ST', 7), ('EWS', 5)]
+BATCH_SIZE = 2000
+
+
+def clear_synthetic(prefix):
+    """Delete everything a previous run with this prefix generated. Branches and castes are kept."""
+    deleted = {}
+    deleted['groups'] = RoomGroup.objects.filter(name__startswith=f"Room-{prefix}").delete()[0]
+    deleted['blocks'] = Block.objects.filter(name__startswith=f"{prefix}-").delete()[0]
+    deleted['students'] = StudentDataEntry.objects.filter(roll_no__startswith=prefix).delete()[0]
+    deleted['verification'] = StudentDataVerification.objects.filter(roll_no__startswith=prefix).delete()[0]
+    deleted['users'] = CustomUser.objects.filter(username__startswith=prefix).delete()[0]
+    return deleted
+
+
+def preference_order(room_ids, popularity, count, rnd):
+    """
+    A random ranking of `count` rooms in which popular rooms tend to come first
+    (weighted sampling without replacement, one exponential key per room).
+    """
+    keys = [(-math.log(1.0 - rnd.random()) / weight, room_id) for room_id, weight in zip(room_ids, popularity)]
+    keys.sort()
+    return [room_id for _, room_id in keys[:count]]
+
+
+def generate_hostel(
+    years=None,
+    genders=None,
+    blocks=1,
+    floors=2,
+    rooms=20,
+    capacity=2,
+    branches=5,
+    students_per_branch=40,
+    cgpa_mean=7.5,
+    cgpa_sd=1.0,
+    rank_spread=5,
+    jee_share=0.1,
+    preferences=None,
+    preference_skew=1.0,
+    verified=1.0,
+    ranked=True,
+    prefix='synth',
+    seed=0,
+):
+    """
+    Generate blocks, floors, rooms, students, room groups and preferences for
+    every (class_name, gender) partition, written with bulk_create in one
+    transaction. `blocks`, `floors` and `rooms` (per floor) are per partition;
+    groups are filled to the block's per_room_capacity and each group ranks
+    `preferences` rooms of its partition (all of them by default).
+    Returns row counts and the elapsed time.
+    """
+    rnd = random.Random(seed)
+    years = years or [choice[0] for choice in StudentDataEntry.CLASS_CHOICES]
+    genders = genders or [choice[0] for choice in StudentDataEntry.GENDER_CHOICES]
+    started = time.perf_counter()
+    # Hashing a password per student would dominate the run; share one unusable hash
+    password = make_password(None)
+
+    with transaction.atomic():
+        admission_category, _ = AdmissionCategory.objects.get_or_create(admission_category='CAP')
+        branch_objs = {}
+        caste_objs = {}
+        for year in years:
+            branch_objs[year] = [
+                Branch.objects.get_or_create(branch=name, year=year, defaults={'seat_allocation_weight': 1})[0]
+                for name in BRANCH_NAMES[:branches]
+            ]
+            caste_objs[year] = [
+                Caste.objects.get_or_create(caste=caste, year=year, defaults={'seat_matrix_percentage': share})[0]
+                for caste, share in CASTES
+            ]
+            # Castes made before percentages were set get them, unless the year already has its own split
+            if not Caste.objects.filter(year=year, seat_matrix_percentage__isnull=False).exists():
+                for caste, (_, share) in zip(caste_objs[year], CASTES):
+                    caste.seat_matrix_percentage = share
+                    caste.save(update_fields=['seat_matrix_percentage'])
+        caste_weights = [share for _, share in CASTES]
+
+        # Blocks, floors and rooms
+        block_rows = []
+        for year in years:
+            for gender in genders:
+                for b in range(blocks):
+                    block_rows.append(Block(
+                        name=f"{prefix}-{year}-{gender}-{b + 1}",
+                        description="Synthetic block",
+                        per_room_capacity=capacity,
+                    ))
+        Block.objects.bulk_create(block_rows, batch_size=BATCH_SIZE)
+
+        floor_rows = []
+        block_iter = iter(block_rows)
+        for year in years:
+            for gender in genders:
+                for _ in range(blocks):
+                    block = next(block_iter)
+                    for f in range(floors):
+                        floor_rows.append(Floor(
+                            block=block, number=f + 1, name=f"Floor {f + 1}", gender=gender, class_name=year
+                        ))
+        Floor.objects.bulk_create(floor_rows, batch_size=BATCH_SIZE)
+
+        room_rows = []
+        partition_rooms = {}
+        for floor in floor_rows:
+            for r in range(rooms):
+                room = Room(floor=floor, room_id=f"{floor.number}{r + 1:03d}")
+                room_rows.append(room)
+                partition_rooms.setdefault((floor.class_name, floor.gender), []).append(room)
+        Room.objects.bulk_create(room_rows, batch_size=BATCH_SIZE)
+
+        # Students
+        users = []
+        students = []
+        verifications = []
+        partition_students = {}
+        for year in years:
+            # Distinct entrance ranks drawn from a range rank_spread times the intake
+            intake = len(genders) * len(branch_objs[year]) * students_per_branch
+            entrance_ranks = iter(rnd.sample(range(1, intake * rank_spread + 1), intake))
+            for gender in genders:
+                serial = 0
+                for branch in branch_objs[year]:
+                    branch_students = []
+                    for _ in range(students_per_branch):
+                        serial += 1
+                        entrance_rank = next(entrance_ranks)
+                        exam = 'jee_mains' if rnd.random() < jee_share else 'mht_cet'
+                        roll_no = f"{prefix}{year}{gender[0]}{serial:06d}"
+                        caste = rnd.choices(caste_objs[year], weights=caste_weights)[0]
+                        is_verified = rnd.random() < verified
+                        cgpa = None
+                        if year != 'fy':
+                            cgpa = round(min(10.0, max(4.0, rnd.gauss(cgpa_mean, cgpa_sd))), 2)
+                        user = CustomUser(
+                            username=roll_no,
+                            email=f"{roll_no}@{prefix}.example.com",
+                            password=password,
+                            user_type='student',
+                            class_name=year,
+                        )
+                        users.append(user)
+                        student = StudentDataEntry(
+                            user=user,
+                            roll_no=roll_no,
+                            personal_mail=user.email,
+                            first_name=f"Student{serial}",
+                            last_name=branch.branch,
+                            gender=gender,
+                            mobile_number=f"9{rnd.randrange(10 ** 9):09d}",
+                            class_name=year,
+                            branch=branch,
+                            blood_group=rnd.choice(StudentDataEntry.BLOOD_GROUP_CHOICES)[0],
+                            admission_category=admission_category,
+                            rank=entrance_rank if year == 'fy' else None,
+                            cgpa=cgpa,
+                            caste=caste,
+                            parent_name=f"Parent{serial}",
+                            parent_contact=f"8{rnd.randrange(10 ** 9):09d}",
+                            permanent_address="Pune, Maharashtra",
+                            entrance_exam=exam if year == 'fy' else None,
+                            backlogs=0,
+                            verified=True if is_verified else None,
+                        )
+                        students.append(student)
+                        branch_students.append(student)
+                        if is_verified:
+                            verifications.append(StudentDataVerification(
+                                roll_no=roll_no,
+                                email=user.email,
+                                class_name=year,
+                                backlogs=0,
+                                cgpa=cgpa,
+                                rank=student.rank,
+                                gender=gender,
+                                caste=caste,
+                            ))
+                    partition_students.setdefault((year, gender), []).extend(branch_students)
+
+        CustomUser.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        StudentDataEntry.objects.bulk_create(students, batch_size=BATCH_SIZE)
+        StudentDataVerification.objects.bulk_create(verifications, batch_size=BATCH_SIZE)
+        if ranked:
+            # Ranked the way production ranks them, not by a formula of our own
+            cgpa_years = [year for year in years if year in CGPA_RANKED_YEARS]
+            if cgpa_years:
+                assign_cgpa_branch_ranks(cgpa_years, roll_no__startswith=prefix)
+            if 'fy' in years:
+                assign_fy_branch_ranks(roll_no__startswith=prefix)
+
+        # Room groups of per_room_capacity students, led by the first member
+        groups = []
+        group_members = []
+        for (year, gender), members in partition_students.items():
+            members = members[:]
+            rnd.shuffle(members)
+            for start in range(0, len(members), capacity):
+                chunk = members[start:start + capacity]
+                groups.append(RoomGroup(name=f"Room-{chunk[0].roll_no}", gender=gender, class_name=year))
+                group_members.append(chunk)
+        RoomGroup.objects.bulk_create(groups, batch_size=BATCH_SIZE)
+
+        Membership = RoomGroup.members.through
+        Membership.objects.bulk_create(
+            [
+                Membership(roomgroup_id=group.id, customuser_id=student.user.id)
+                for group, chunk in zip(groups, group_members)
+                for student in chunk
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        # Preferences: rooms listed earlier in a partition are more popular (Zipf-like, preference_skew)
+        preference_count = 0
+        batch = []
+        for group in groups:
+            candidates = partition_rooms.get((group.class_name, group.gender), [])
+            if not candidates:
+                continue
+            room_ids = [room.id for room in candidates]
+            popularity = [1.0 / (index + 1) ** preference_skew for index in range(len(candidates))]
+            count = len(candidates) if preferences is None else min(preferences, len(candidates))
+            for rank, room_id in enumerate(preference_order(room_ids, popularity, count, rnd), 1):
+                batch.append(Preference(room_group_id=group.id, room_id=room_id, rank=rank))
+            if len(batch) >= BATCH_SIZE * 10:
+                Preference.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+                preference_count += len(batch)
+                batch = []
+        Preference.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+        preference_count += len(batch)
+
+    return {
+        'blocks': len(block_rows),
+        'floors': len(floor_rows),
+        'rooms': len(room_rows),
+        'students': len(students),
+        'verified': len(verifications),
+        'groups': len(groups),
+        'preferences': preference_count,
+        'elapsed_seconds': round(time.perf_counter() - started, 2),
+    }
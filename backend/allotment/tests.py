@@ -1,3 +1,295 @@
-from django.test import TestCase
+import itertools
+import random
+from collections import Counter
+from django.test import SimpleTestCase, TestCase
+from authentication.models import AdmissionCategory, Branch, Caste, StudentDataEntry
+from .engine import PartitionSnapshot, reallot
+from .models import DirtyRankPartition
+from .occupancy import OccupancyIndex
+from .scheduler import turn_sequence, weight_units
+from .strategies import STRATEGIES, PreferenceMatrix, satisfaction
 
-# Create your tests here.
+
+def build_snapshot(preferences, branches, ranks, room_count, occupied=(), held=None):
+    """
+    PartitionSnapshot over rooms 1..room_count. `preferences` maps group id ->
+    (branch id, [room ids]); `ranks` maps group id -> branch rank; rooms in
+    `occupied` are held by someone outside the cohort and `held` maps room id
+    -> the cohort group holding it now.
+    """
+    held = held or {}
+    groups = {
+        group_id: {
+            'id': group_id,
+            'name': f"group-{group_id}",
+            'branch_id': branch_id,
+            'branch_rank': ranks[group_id],
+            'preferences': rooms,
+        }
+        for group_id, (branch_id, rooms) in preferences.items()
+    }
+    rooms = {
+        room_id: {
+            'id': room_id,
+            'room_number': str(100 + room_id),
+            'is_occupied': room_id in occupied or room_id in held,
+            'alloted_group_id': 999 if room_id in occupied else held.get(room_id),
+        }
+        for room_id in range(1, room_count + 1)
+    }
+    return PartitionSnapshot('fy', 'male', groups, branches, rooms)
+
+
+def build_matrix(preferences, branches, ranks, room_count, occupied=()):
+    """PreferenceMatrix over the snapshot build_snapshot() describes."""
+    return PreferenceMatrix(build_snapshot(preferences, branches, ranks, room_count, occupied))
+
+
+class WeightedTurnsTests(SimpleTestCase):
+    def test_turns_follow_weights(self):
+        # Per two rounds: 0.5 -> 1 turn, 1.0 -> 2 turns, 2.0 -> 4 turns
+        turns = turn_sequence([(1, 0.5), (2, 1), (3, 2)], {1: 100, 2: 100, 3: 100})
+        self.assertEqual(Counter(turns[:70]), {1: 10, 2: 20, 3: 40})
+
+    def test_double_weight_takes_consecutive_turns(self):
+        turns = turn_sequence([(1, 1), (2, 2)], {1: 3, 2: 6})
+        self.assertEqual(turns, [1, 2, 2, 1, 2, 2, 1, 2, 2])
+
+    def test_yields_exactly_the_demand(self):
+        demand = {1: 3, 2: 7, 3: 0, 4: 5}
+        turns = turn_sequence([(1, 0.5), (2, 2), (3, 1), (4, 1.25)], demand)
+        self.assertEqual(Counter(turns), {1: 3, 2: 7, 4: 5})
+
+    def test_missing_or_non_positive_weight_counts_as_one(self):
+        self.assertEqual(weight_units(None), weight_units(1))
+        self.assertEqual(weight_units(0), weight_units(1))
+        self.assertEqual(weight_units(-2), weight_units(1))
+        self.assertEqual(weight_units(0.5), 50)
+
+
+class StrategyTests(SimpleTestCase):
+    def setUp(self):
+        # Two branches; room 5 is held outside the cohort
+        self.matrix = build_matrix(
+            {
+                1: (10, [1, 2, 5]),
+                2: (10, [1, 3]),
+                3: (20, [1, 2, 4]),
+                4: (20, [5, 2]),
+                5: (20, [4]),
+            },
+            branches=[(10, 1), (20, 1)],
+            ranks={1: 1, 2: 2, 3: 1, 4: 2, 5: 3},
+            room_count=5,
+            occupied={5},
+        )
+
+    def test_every_strategy_returns_a_valid_allotment(self):
+        for name, strategy in STRATEGIES.items():
+            with self.subTest(strategy=name):
+                placed, unplaced = strategy.allot(self.matrix, seed=7)
+                rooms = list(placed.values())
+                self.assertEqual(len(rooms), len(set(rooms)))
+                self.assertEqual(sorted(list(placed) + unplaced), list(range(self.matrix.group_count)))
+                for group, room in placed.items():
+                    self.assertIn(room, self.matrix.row(group))
+                    self.assertFalse(self.matrix.blocked[room])
+
+    def test_every_strategy_is_deterministic_for_a_seed(self):
+        for name, strategy in STRATEGIES.items():
+            with self.subTest(strategy=name):
+                self.assertEqual(strategy.allot(self.matrix, seed=3), strategy.allot(self.matrix, seed=3))
+
+    def test_better_rank_gets_the_contested_room(self):
+        matrix = build_matrix(
+            {1: (10, [1]), 2: (10, [1])}, branches=[(10, 1)], ranks={1: 2, 2: 1}, room_count=1
+        )
+        for name in ('branch_round_robin', 'serial_dictatorship'):
+            with self.subTest(strategy=name):
+                placed, unplaced = STRATEGIES[name].allot(matrix, seed=1)
+                self.assertEqual(matrix.to_ids(placed, unplaced), ({2: 1}, [1]))
+
+    def test_min_cost_places_more_groups_than_greedy(self):
+        matrix = build_matrix(
+            {1: (10, [1, 2]), 2: (10, [1])}, branches=[(10, 1)], ranks={1: 1, 2: 2}, room_count=2
+        )
+        placed, _ = STRATEGIES['serial_dictatorship'].allot(matrix)
+        self.assertEqual(satisfaction(matrix, placed)['placed'], 1)
+        placed, unplaced = STRATEGIES['min_cost'].allot(matrix)
+        self.assertEqual(matrix.to_ids(placed, unplaced), ({1: 2, 2: 1}, []))
+
+
+class OccupancyIndexTests(SimpleTestCase):
+    def test_room_numbers_are_looked_up_by_capacity(self):
+        # Room 101 exists in a 2-seat and a 4-seat block, 102 in two 2-seat blocks
+        index = OccupancyIndex('fy', 'male', [
+            (1, '101', 2, False, None),
+            (2, '101', 4, True, 7),
+            (3, '102', 2, False, None),
+            (4, '102', 2, False, None),
+        ])
+        self.assertEqual(index.room_ids[index.lookup_number('101', 2)], 1)
+        self.assertEqual(index.room_ids[index.lookup_number('101', 4)], 2)
+        self.assertIsNone(index.lookup_number('102', 2))
+        self.assertIsNone(index.lookup_number('101', 3))
+        self.assertEqual(index.free_room_numbers(), ['101', '102', '102'])
+
+
+class ReallotTests(SimpleTestCase):
+    def setUp(self):
+        # Groups 1-3 hold rooms 1-3; group 4 waits for a room
+        self.snapshot = build_snapshot(
+            {
+                1: (10, [1, 4]),
+                2: (10, [2, 1]),
+                3: (10, [3]),
+                4: (10, [1, 2]),
+            },
+            branches=[(10, 1)],
+            ranks={1: 1, 2: 2, 3: 3, 4: 4},
+            room_count=4,
+            held={1: 1, 2: 2, 3: 3},
+        )
+
+    def test_displaced_group_moves_to_its_next_free_room(self):
+        assignments, unplaced, released = reallot(self.snapshot, [4], released_rooms=[1])
+        # The waitlisted group takes the released room
+        self.assertEqual(assignments, {1: 4, 2: 2, 3: 3, 4: 1})
+        self.assertEqual((unplaced, released), ([], {1}))
+
+    def test_displaced_group_without_a_free_room_is_waitlisted(self):
+        assignments, unplaced, _ = reallot(self.snapshot, [4], released_rooms=[3])
+        self.assertEqual(assignments, {1: 1, 2: 2})
+        self.assertEqual(unplaced, [3, 4])
+
+    def test_released_room_goes_to_the_waitlist(self):
+        snapshot = build_snapshot(
+            {1: (10, [1]), 2: (10, [2]), 3: (10, [1])},
+            branches=[(10, 1)], ranks={1: 1, 2: 2, 3: 3}, room_count=2, held={1: 1, 2: 2},
+        )
+        assignments, unplaced, _ = reallot(snapshot, [3], released_rooms=[1])
+        self.assertEqual((assignments, unplaced), ({2: 2, 3: 1}, [1]))
+
+
+def brute_force(matrix):
+    """Best (placed, total rank) over every allotment of a tiny matrix."""
+    options = [
+        [None] + [room for room in matrix.row(group) if not matrix.blocked[room]]
+        for group in range(matrix.group_count)
+    ]
+    best = (0, 0)
+    for choice in itertools.product(*options):
+        rooms = [room for room in choice if room is not None]
+        if len(rooms) != len(set(rooms)):
+            continue
+        total = sum(
+            list(matrix.row(group)).index(room) + 1 for group, room in enumerate(choice) if room is not None
+        )
+        # More groups placed first, then the lower rank total
+        if (len(rooms), -total) > (best[0], -best[1]):
+            best = (len(rooms), total)
+    return best
+
+
+class MinCostBruteForceTests(SimpleTestCase):
+    def test_matches_brute_force_on_random_instances(self):
+        rnd = random.Random(2024)
+        for case in range(150):
+            group_count = rnd.randint(1, 6)
+            room_count = rnd.randint(1, 6)
+            preferences = {
+                group_id: (rnd.randint(1, 2), rnd.sample(range(1, room_count + 1), rnd.randint(0, room_count)))
+                for group_id in range(1, group_count + 1)
+            }
+            ranks = {group_id: rnd.randint(1, group_count) for group_id in preferences}
+            occupied = set(rnd.sample(range(1, room_count + 1), rnd.randint(0, room_count // 2)))
+            matrix = build_matrix(preferences, [(1, 1), (2, 1)], ranks, room_count, occupied)
+
+            placed, _ = STRATEGIES['min_cost'].allot(matrix)
+            result = satisfaction(matrix, placed)
+            with self.subTest(case=case, preferences=preferences, occupied=occupied):
+                self.assertEqual((result['placed'], result['total_rank']), brute_force(matrix))
+
+
+def make_student(roll_no, branch, class_name='sy', gender='male', **fields):
+    """A StudentDataEntry with just the required fields filled in."""
+    return StudentDataEntry.objects.create(
+        roll_no=roll_no,
+        personal_mail=f"{roll_no}@example.com",
+        first_name=roll_no,
+        gender=gender,
+        mobile_number='9000000000',
+        class_name=class_name,
+        branch=branch,
+        blood_group='O+',
+        admission_category=AdmissionCategory.objects.get_or_create(admission_category='CAP')[0],
+        caste=Caste.objects.get_or_create(caste='OPEN', year=class_name)[0],
+        parent_name='Parent',
+        parent_contact='8000000000',
+        permanent_address='Pune',
+        **fields,
+    )
+
+
+class DirtyPartitionRerankTests(TestCase):
+    def setUp(self):
+        self.computer = Branch.objects.create(branch='Computer', year='sy')
+        self.civil = Branch.objects.create(branch='Civil', year='sy')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.students = [
+                make_student(f"sy{index}", self.computer, cgpa=cgpa)
+                for index, cgpa in enumerate([9.0, 8.0, 7.0], 1)
+            ]
+            make_student('sy4', self.civil, cgpa=6.0)
+
+    def branch_ranks(self, **filters):
+        return dict(StudentDataEntry.objects.filter(**filters).values_list('roll_no', 'branch_rank'))
+
+    def dirty(self):
+        return set(DirtyRankPartition.objects.values_list('class_name', 'branch_id', 'gender'))
+
+    def test_new_students_are_ranked_on_commit(self):
+        self.assertEqual(self.branch_ranks(), {'sy1': 1, 'sy2': 2, 'sy3': 3, 'sy4': 1})
+        self.assertEqual(self.dirty(), set())
+
+    def test_cgpa_change_reranks_its_partition(self):
+        student = self.students[2]
+        with self.captureOnCommitCallbacks(execute=True):
+            student.cgpa = 9.5
+            student.save()
+            self.assertEqual(self.dirty(), {('sy', self.computer.id, 'male')})
+        self.assertEqual(self.dirty(), set())
+        self.assertEqual(self.branch_ranks(branch=self.computer), {'sy1': 2, 'sy2': 3, 'sy3': 1})
+        # The saved instance gets its new rank back
+        self.assertEqual(student.branch_rank, 1)
+
+    def test_branch_change_reranks_both_partitions(self):
+        student = self.students[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            student.branch = self.civil
+            student.save()
+            self.assertEqual(
+                self.dirty(), {('sy', self.computer.id, 'male'), ('sy', self.civil.id, 'male')}
+            )
+        self.assertEqual(self.branch_ranks(), {'sy1': 1, 'sy2': 1, 'sy3': 2, 'sy4': 2})
+
+    def test_entrance_rank_change_reranks_fy(self):
+        branch = Branch.objects.create(branch='Computer', year='fy')
+        with self.captureOnCommitCallbacks(execute=True):
+            first = make_student('fy1', branch, class_name='fy', rank=10, entrance_exam='mht_cet')
+            make_student('fy2', branch, class_name='fy', rank=20, entrance_exam='mht_cet')
+        self.assertEqual(self.branch_ranks(class_name='fy'), {'fy1': 1, 'fy2': 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.rank = 30
+            first.save(update_fields=['rank'])
+            self.assertEqual(self.dirty(), {('fy', branch.id, 'male')})
+        self.assertEqual(self.branch_ranks(class_name='fy'), {'fy1': 2, 'fy2': 1})
+
+    def test_other_fields_leave_ranks_alone(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            student = self.students[1]
+            student.first_name = 'Renamed'
+            student.save()
+            self.assertEqual(self.dirty(), set())
+        self.assertEqual(self.branch_ranks(branch=self.computer), {'sy1': 1, 'sy2': 2, 'sy3': 3})
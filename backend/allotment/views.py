@@ -5,9 +5,11 @@ from rest_framework import status, viewsets
 from rest_framework.permissions import IsAuthenticated
 from authentication.permissions import IsStudent
 from .models import *
+from .occupancy import OccupancyIndex
 from adminrole.models import *
 from .serializers import *
 from django.http import JsonResponse
+from django.db import transaction
 from django.db.models import Q
 
 User = get_user_model()
@@ -399,26 +401,25 @@ class PreferenceView(APIView):
                     {"error": f"Room group must have exactly {block.per_room_capacity} members to save preferences"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            serializer = PreferenceSubmitSerializer(data=request.data, context={'request': request})
+            occupancy = OccupancyIndex.load(student_data.class_name, student_data.gender)
+            serializer = PreferenceSubmitSerializer(
+                data=request.data, context={'request': request, 'occupancy': occupancy}
+            )
             
             if serializer.is_valid():
                 preferences = serializer.validated_data['preferences']
-                
-                Preference.objects.filter(room_group=group).delete()
-                
+
+                rows = []
                 for rank, room_id in enumerate(preferences, 1):
                     # Ensure room belongs to a block with matching capacity
-                    room = Room.objects.get(
-                        room_id=room_id,
-                        floor__gender=student_data.gender,
-                        floor__class_name=student_data.class_name,
-                        floor__block__per_room_capacity=block.per_room_capacity
-                    )
-                    Preference.objects.create(
-                        room_group=group,
-                        room=room,
-                        rank=rank
-                    )
+                    index = occupancy.lookup_number(room_id, block.per_room_capacity)
+                    if index is None:
+                        raise Room.DoesNotExist
+                    rows.append(Preference(room_group=group, room_id=occupancy.room_ids[index], rank=rank))
+
+                with transaction.atomic():
+                    Preference.objects.filter(room_group=group).delete()
+                    Preference.objects.bulk_create(rows)
                 
                 return Response({"message": "Preferences saved successfully"}, status=status.HTTP_200_OK)
             
@@ -1,5 +1,5 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 
 class CustomUser(AbstractUser):
     USER_TYPES = (
@@ -152,6 +152,12 @@ class StudentDataEntry(models.Model):
     def __str__(self):
         return f"{self.first_name} {self.last_name or ''} ({self.roll_no})"
 
+    def save(self, *args, **kwargs):
+        # One transaction for the row and the save signals, so the registration
+        # counters (adminrole.counters) move together with the row they count
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 class StudentDataVerification(models.Model):
     roll_no = models.CharField(max_length=20, primary_key=True)
     email = models.EmailField(unique=True, null=True, blank=True)
@@ -25,6 +25,9 @@ python manage.py collectstatic --noinput
 echo "Migrating DB..."
 python manage.py migrate
 
+echo "Registering cron jobs..."
+python manage.py crontab add
+
 echo "Setting up Gunicorn socket & service..."
 sudo tee /etc/systemd/system/gunicorn.socket > /dev/null <<EOF
 [Unit]
@@ -53,11 +56,29 @@ ExecStart=$BACKEND_DIR/env/bin/gunicorn --access-logfile - --workers 3 --bind un
 WantedBy=multi-user.target
 EOF
 
+# Background job worker for allotment, ranking and exports
+sudo tee /etc/systemd/system/hostel-jobs.service > /dev/null <<EOF
+[Unit]
+Description=hostel background job worker
+After=network.target
+
+[Service]
+User=$USER
+Group=www-data
+WorkingDirectory=$BACKEND_DIR
+ExecStart=$BACKEND_DIR/env/bin/python manage.py run_jobs
+Restart=always
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
 echo "Starting Gunicorn..."
 sudo systemctl daemon-reexec
 sudo systemctl daemon-reload
 sudo systemctl start gunicorn.socket
 sudo systemctl enable gunicorn.socket
+sudo systemctl enable --now hostel-jobs.service
 
 echo "Building frontend..."
 cd $FRONTEND_DIR